@@ -0,0 +1,111 @@
+import pandas as pd
+from os import path, remove, replace
+from glob import glob
+import logging
+from logging.handlers import QueueHandler, QueueListener
+import multiprocessing
+import atexit
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    from pyarrow import ArrowException
+except ImportError:
+    # pyarrow is optional, pandas is used instead if it is not installed
+    pa = None
+    ArrowException = ImportError
+
+# Shared helpers of the data preprocessing programs (each program imports what it needs from here)
+
+
+def config_logging() -> multiprocessing.Queue:
+    # This function configs logging and prepares it for logging process
+    # Note that logging creates logs from every operation has been done in the program which is the more flexible, durable, and powerful than only using print
+    # Whenever you want a new logging, just delete the existing one!
+    # The records are put in a queue and a background thread writes them to the console and the file, so the program does not wait for the disk on every record
+    # It is a multiprocessing queue, so the worker processes of a program can also put their records in it (see config_worker_logging)
+    log_queue = multiprocessing.Queue(-1)
+    listener = QueueListener(log_queue, logging.StreamHandler(), logging.FileHandler("all_operations.log"))
+    listener.start()
+    # Stop the listener when the program exits, so the remaining records in the queue are also written
+    atexit.register(listener.stop)
+    logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        QueueHandler(log_queue)
+    ]
+    )
+
+    return log_queue
+
+
+def config_worker_logging(log_queue : multiprocessing.Queue):
+    # This function configs logging of a worker process
+    # The records are put in the queue of the main process, so they are written by its listener to the same console and file
+    logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        QueueHandler(log_queue)
+    ],
+    force=True
+    )
+
+
+def config_worker(log_queue : multiprocessing.Queue):
+    # This function is the initializer of the worker processes which run the methods on their own (pickled) copy of the dataset
+    # Copy-on-write is enabled in the worker, so the shallow copies in the methods share the memory of that copy
+    # and only the columns which are changed get copied (the option of the main process is not passed to a spawned process)
+    config_worker_logging(log_queue)
+    pd.set_option("mode.copy_on_write", True)
+
+
+def load_parquet(file_path : str) -> pd.DataFrame:
+    # Parquet files keep the data types, so no type inference is needed (e.g., the output of convert_datatype)
+    # A folder of parquet files (e.g., written chunk by chunk) is loaded part by part and concat into one dataframe,
+    # since the data types of the parts may be slightly different (e.g., int8 and int16)
+    parts = sorted(glob(path.join(file_path, "*.parquet"))) if path.isdir(file_path) else [file_path]
+    return pd.concat([pd.read_parquet(part) for part in parts], ignore_index=True)
+
+
+def load_data(file_path : str) -> pd.DataFrame:
+    # Open csv (or parquet) file and load it into a dataframe
+    try:
+        if file_path.endswith(".parquet"):
+            data = load_parquet(file_path)
+        else:
+            try:
+                # The pyarrow engine parses the file in parallel and infers the column types while parsing
+                data = pd.read_csv(file_path, engine="pyarrow")
+            except ImportError:
+                # If pyarrow is not installed, the default engine is used
+                data = pd.read_csv(file_path)
+    except (OSError, ValueError) as e:
+        # Only the expected errors are handled (e.g., file not found or not a valid csv), others (e.g., MemoryError) are raised
+        logging.error(f"The path is invalid! {e}")
+        return pd.DataFrame()
+
+    # Return the first 5 rows of the dataset
+    logging.info(f"\n{data.head()}")
+
+    return data
+
+
+def save_data(data : pd.DataFrame, file_path : str):
+    # Save the dataset into a temporary file first and then rename it to file_path (rename is atomic),
+    # so file_path never contains a half-written dataset (e.g., if the program crashes while writing)
+    # If the dataset is empty, the file of the previous runs is removed, since it is not valid anymore
+    if data.empty:
+        if path.exists(file_path):
+            remove(file_path)
+        return
+    temp_file_path = file_path + ".tmp"
+    # The pyarrow csv writer is implemented in C++ and is several times faster than to_csv (especially for string columns)
+    # If pyarrow is not installed or it can not convert a column (e.g., mixed types in an object column), to_csv is used
+    try:
+        if pa is None:
+            raise ImportError
+        pa_csv.write_csv(pa.Table.from_pandas(data, preserve_index=False), temp_file_path)
+    except (ImportError, ArrowException):
+        data.to_csv(temp_file_path, index=False)
+    replace(temp_file_path, file_path)
@@ -1,75 +1,149 @@
 import pandas as pd
+import numpy as np
 import sys
-from os import path, makedirs
+from os import path, makedirs, remove, replace
 import shutil
 import logging
-from typing import Dict
-
-def config_logging():
-    # This function configs logging and prepares it for logging process
-    # Note that logging creates logs from every operation has been done in the program which is the more flexible, durable, and powerful than only using print
-    # Whenever you want a new logging, just delete the existing one!
-    logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler("all_operations.log")
-    ]
-    )
-
-
-def load_data(file_path : str) -> pd.DataFrame:
-    # Open csv file and load it into a dataframe
+from common import config_logging, load_data
+from typing import Dict, Iterator, Tuple
+try:
+    import pyarrow as pa
+except ImportError:
+    # pyarrow is optional, pandas is used instead if it is not installed
+    pa = None
+
+def load_data_chunks(file_path : str, chunksize : int = 200_000, dtype : Dict = None) -> Iterator[pd.DataFrame]:
+    # Open csv file and read it chunk by chunk, so only one chunk is in the memory at a time
+    # Note that the pyarrow engine does not support chunksize, so the default engine is used here
+    # Parameter dtype can be given to read some columns with a fixed type instead of inferring it per chunk (e.g., {"Name": str})
     try:
-        data = pd.read_csv(file_path)
-    except:
-        logging.error("The path is invalid!")
-        return pd.DataFrame()
+        reader = pd.read_csv(file_path, chunksize=chunksize, dtype=dtype)
+    except (OSError, ValueError) as e:
+        # Only the expected errors are handled (e.g., file not found or not a valid csv), others (e.g., MemoryError) are raised
+        logging.error(f"The path is invalid! {e}")
+        return
 
-    # Return the first 5 rows of the dataset
-    logging.info(f"\n{data.head()}")
+    with reader:
+        for chunk in reader:
+            yield chunk
 
-    return data
+
+def remove_output(file_path : str):
+    # Remove a converted dataset of the previous runs, which is a parquet file or a folder of parquet parts
+    if path.isdir(file_path):
+        shutil.rmtree(file_path)
+    elif path.exists(file_path):
+        remove(file_path)
+
+
+def save_parquet(data : pd.DataFrame, file_path : str):
+    # Save the dataset into a temporary file first and then rename it to file_path (like save_data of the other programs),
+    # so file_path never contains a half-written dataset
+    # If the dataset is empty, the dataset of the previous runs is removed, since it is not valid anymore
+    if data.empty:
+        remove_output(file_path)
+        return
+    temp_file_path = file_path + ".tmp"
+    data.to_parquet(temp_file_path, compression="zstd", index=False)
+    # A folder can not be replaced by a file (e.g., the output of a previous chunk by chunk conversion)
+    if path.isdir(file_path):
+        shutil.rmtree(file_path)
+    replace(temp_file_path, file_path)
+
+
+def convert_to_numeric(column : pd.Series) -> pd.Series:
+    # Parse a text column to float by pyarrow cast, which is implemented in C++ and several times faster than pd.to_numeric
+    # If pyarrow is not installed or some values are not numbers, pd.to_numeric is used and the invalid values become NaN (errors="coerce")
+    if pa is not None and column.dtype == "object":
+        try:
+            parsed_values = pa.array(column, from_pandas=True).cast(pa.float64()).to_numpy(zero_copy_only=False)
+            return pd.Series(parsed_values, index=column.index, name=column.name)
+        except pa.ArrowException:
+            pass
+    return pd.to_numeric(column, errors="coerce")
+
+
+def convert_to_datetime(column : pd.Series, format : str = None, errors : str = "raise") -> pd.Series:
+    # Parse only the unique values of the column and map the results back to the rows
+    # Date columns usually have a lot of repeated values, so the parsing cost drops from the number of rows to the number of unique values
+    unique_values = column.dropna().unique()
+    # If the format is given, exact=True makes pandas match the whole value with the format in C and never fall back to the slow dateutil parser
+    parsed_values = pd.to_datetime(pd.Series(unique_values), format=format, exact=True, cache=True, errors=errors)
+    # Missing values are not in the mapping, so they become NaT
+    # The mapping is a series (rather than a dict) to keep the datetime type even if the column has no values
+    return column.map(pd.Series(parsed_values.array, index=unique_values))
 
 
 def convert_datatype_auto(data : pd.DataFrame) -> pd.DataFrame:
     # Show the data types before applying any conversion
-    logging.info(f"Before automatic datatype conversion, the datatype are as follows:\n{data.dtypes}")
+    logging.debug("Before automatic datatype conversion, the datatype are as follows:\n%s", data.dtypes)
+
+    # Let pandas infer the better types of the object columns in one pass (e.g., object columns which only contain numbers)
+    data = data.infer_objects()
 
-    # If the data type of the columns is not numeric, it try to convert it to datatime type
+    # Convert data type of the numeric-like columns which has object type
+    # Values which are not numeric become NaN (errors="coerce"), so the column is converted only if no value is lost
+    # This way the check is done by pandas instead of raising and catching an exception for each column
+    for col in data.select_dtypes(include="object").columns:
+        converted = pd.to_numeric(data[col], errors="coerce")
+        if converted.notna().sum() == data[col].notna().sum():
+            data[col] = converted
+
+    # If the data type of the columns is still not numeric, it try to convert it to datatime type
     # If the column content is not datetime no changes will happen
     for col in data.columns:
-        try:
-            # Convert data type of the numeric-like columns which has object type
-            if data[col].dtype == "object":
-                data[col] = pd.to_numeric(data[col])
-        except:
-            pass
-
-        try:
-            if not pd.api.types.is_numeric_dtype(data[col]):
-                data[col] = pd.to_datetime(data[col])
-        except:
-            pass
+        if not pd.api.types.is_numeric_dtype(data[col]) and not pd.api.types.is_datetime64_any_dtype(data[col]):
+            converted = convert_to_datetime(data[col], errors="coerce")
+            if converted.notna().sum() == data[col].notna().sum():
+                data[col] = converted
 
     # Show the data types after applying auto conversions
-    logging.info(f"After automatic datatype conversion, the datatype are as follows:\n{data.dtypes}")
+    logging.debug("After automatic datatype conversion, the datatype are as follows:\n%s", data.dtypes)
 
     return data    
 
+def convert_datatype_learned(data : pd.DataFrame, datatypes : Dict) -> pd.DataFrame:
+    # Apply the data types which are learned from another part of the dataset (e.g., the first chunk), so the type inference is skipped
+    # If a column does not fit its learned data type (e.g., a text appears in a numeric column), the invalid values become missing values,
+    # so all the parts of the dataset still get the same types
+    for col, dt in datatypes.items():
+        try:
+            if pd.api.types.is_datetime64_any_dtype(dt):
+                data[col] = convert_to_datetime(data[col])
+            else:
+                data[col] = data[col].astype(dt)
+        except (ValueError, TypeError):
+            if pd.api.types.is_datetime64_any_dtype(dt):
+                converted = convert_to_datetime(data[col], errors="coerce")
+            elif pd.api.types.is_numeric_dtype(dt):
+                converted = pd.to_numeric(data[col], errors="coerce")
+                if pd.api.types.is_integer_dtype(dt):
+                    # Values with a fraction are not valid for an int column either, and int type does not accept missing values,
+                    # so the nullable int type is used if there is any
+                    converted = converted.where(np.mod(converted, 1) == 0)
+                    converted = converted.astype(dt if converted.notna().all() else "Int64")
+                else:
+                    converted = converted.astype(dt)
+            else:
+                logging.error(f"Column '{col}' does not fit the learned data type '{dt}', so it is not converted!")
+                continue
+            logging.error(f"Column '{col}' does not fit the learned data type '{dt}', so {converted.isna().sum() - data[col].isna().sum()} invalid values become missing values!")
+            data[col] = converted
+
+    return data
+
+
 def convert_datatype_ud(data : pd.DataFrame, convert_scenario : Dict) -> pd.DataFrame:
     # Sample conver_scenario:
     # {"column":["High School Percentage", "Test Date"],
     #  "datatype":["int", "datetime"],
     #  "format":["", "%m/%d/%Y"] }
 
-    # Strip whitespaces
-    for key in convert_scenario.keys():
-        convert_scenario[key] = [item.strip() for item in convert_scenario[key]]
+    # Strip whitespaces (into a new dict, so the caller's scenario is not modified)
+    convert_scenario = {key: [item.strip() for item in items] for key, items in convert_scenario.items()}
 
     # Show the data types before applying any conversion
-    logging.info(f"Before automatic datatype conversion, the datatype are as follows:\n{data.dtypes}")
+    logging.debug("Before automatic datatype conversion, the datatype are as follows:\n%s", data.dtypes)
     
     # Check all the provided column names to be in the dataset
     if not all(col in data.columns for col in convert_scenario["column"]):
@@ -96,35 +170,156 @@ def convert_datatype_ud(data : pd.DataFrame, convert_scenario : Dict) -> pd.Data
         logging.error("Datetime conversion needs format (ISO 8601)")
         return data
     
+    # Values which can not be converted become missing values (errors="coerce") instead of raising an exception
+    # So, the conversion of a column failed if it has more missing values than before
     for col, dt, ft in convert_scenario_zipped:
-        try:
-            match dt:
-                case "int":
-                    # If the current type is not int, the conversion will apply
-                    if not pd.api.types.is_integer_dtype(data[col]):
-                        data[col] = data[col].astype("int")
-                case "float":
-                    # If the current type is not int, the conversion will apply
-                    if not pd.api.types.is_float_dtype(data[col]):
-                        data[col] = data[col].astype("float")
-                case "datetime":
-                    # If the current type is not numeric and datetime, the conversion will apply
-                    if not pd.api.types.is_datetime64_any_dtype(data[col]) and not pd.api.types.is_numeric_dtype(data[col]):
-                        data[col] = pd.to_datetime(data[col], format=ft)
-        except Exception as e:
-            logging.error(f"Conversion failed for column '{col}' with error: {e}")
-            return data
+        match dt:
+            case "int":
+                # If the current type is not int, the conversion will apply
+                if not pd.api.types.is_integer_dtype(data[col]):
+                    converted = convert_to_numeric(data[col])
+                    # Note that int type does not accept missing values at all
+                    if converted.isna().any():
+                        logging.error(f"Conversion failed for column '{col}', since it has non-numeric or missing values!")
+                        return data
+                    # Values with a fraction (e.g., 85.5) would be truncated by the int cast, so they also fail the conversion
+                    if not np.all(np.mod(converted, 1) == 0):
+                        logging.error(f"Conversion failed for column '{col}', since it has non-integer values!")
+                        return data
+                    # The smallest int type which fits the values is chosen (e.g., int8 for percentages), which saves memory for the next operations
+                    data[col] = pd.to_numeric(converted.astype("int"), downcast="integer")
+            case "float":
+                # If the current type is not float, the conversion will apply
+                if not pd.api.types.is_float_dtype(data[col]):
+                    converted = convert_to_numeric(data[col])
+                    if converted.notna().sum() != data[col].notna().sum():
+                        logging.error(f"Conversion failed for column '{col}', since it has non-numeric values!")
+                        return data
+                    # The smallest float type which fits the values is chosen (float32 instead of float64)
+                    # converted is already float64 in most cases, so astype must not make another copy of it
+                    data[col] = pd.to_numeric(converted.astype("float", copy=False), downcast="float")
+            case "datetime":
+                # If the current type is not numeric and datetime, the conversion will apply
+                if not pd.api.types.is_datetime64_any_dtype(data[col]) and not pd.api.types.is_numeric_dtype(data[col]):
+                    converted = convert_to_datetime(data[col], format=ft, errors="coerce")
+                    if converted.notna().sum() != data[col].notna().sum():
+                        logging.error(f"Conversion failed for column '{col}', since it has values which do not match the format '{ft}'!")
+                        return data
+                    data[col] = converted
     
     # Show the data types after applying auto conversions
-    logging.info(f"After automatic datatype conversion, the datatype are as follows:\n{data.dtypes}")
+    logging.debug("After automatic datatype conversion, the datatype are as follows:\n%s", data.dtypes)
 
     return data
 
 
+def merge_datatypes(first_datatype, second_datatype):
+    # Common data type of two parts of a column, like the type read_csv infers for the whole column
+    # Numbers are promoted to the wider type (e.g., int64 and float64 give float64), other different types give object (text)
+    if first_datatype == second_datatype:
+        return first_datatype
+    if all(pd.api.types.is_numeric_dtype(dt) and not pd.api.types.is_bool_dtype(dt) for dt in (first_datatype, second_datatype)):
+        return np.promote_types(first_datatype, second_datatype)
+    return np.dtype("object")
+
+
+def datatype_matches(datatype, ud_datatype : str) -> bool:
+    # Check if a converted column has the user-defined type (numeric columns are not converted to datetime by convert_datatype_ud)
+    match ud_datatype:
+        case "int":
+            return pd.api.types.is_integer_dtype(datatype)
+        case "float":
+            return pd.api.types.is_float_dtype(datatype)
+        case "datetime":
+            return pd.api.types.is_datetime64_any_dtype(datatype) or pd.api.types.is_numeric_dtype(datatype)
+    return False
+
+
+def learn_datatypes(file_path : str, convert_scenario : Dict = None, chunksize : int = 200_000) -> Tuple[Dict, Dict, Dict]:
+    # Learn the data types of the whole csv file chunk by chunk, before any converted chunk is written
+    # Otherwise, each chunk gets its own types (e.g., int64 in one part, float64 in a part with missing values and object in a part with a text)
+    # Returns the types of the read columns, the types of the automatic conversion and the types of the user-defined conversion
+    # The user-defined types are None if the conversion fails in any chunk (like it fails for the whole dataset)
+    read_datatypes, auto_datatypes, ud_datatypes = {}, {}, {}
+    ud_failed = convert_scenario is None
+    for chunk_number, chunk in enumerate(load_data_chunks(file_path, chunksize)):
+        if chunk_number == 0:
+            # Show the first 5 rows of the dataset
+            logging.info("\n%s", chunk.head())
+        has_values = chunk.notna().any()
+        for col, dt in chunk.dtypes.items():
+            read_datatypes[col] = merge_datatypes(read_datatypes.get(col, dt), dt)
+
+        # A column without any value in a chunk (read as float64) does not change the converted type of the other chunks (e.g., datetime)
+        for col, dt in convert_datatype_auto(chunk.copy(deep=False)).dtypes.items():
+            if has_values[col]:
+                auto_datatypes[col] = merge_datatypes(auto_datatypes.get(col, dt), dt)
+
+        if not ud_failed:
+            data_converted = convert_datatype_ud(chunk.copy(deep=False), convert_scenario)
+            for col in convert_scenario["column"]:
+                col = col.strip()
+                if col not in data_converted.columns:
+                    ud_failed = True
+                    break
+                dt = data_converted[col].dtype
+                ud_datatypes[col] = merge_datatypes(ud_datatypes.get(col, dt), dt)
+
+    # The automatic conversion only changes the object columns, so the other columns keep the read types
+    auto_datatypes = {col: auto_datatypes.get(col, dt) if dt == "object" else dt for col, dt in read_datatypes.items()}
+    # The user-defined conversion failed if a column does not have the given type in all chunks (e.g., a text only in the last chunk)
+    if not ud_failed:
+        ud_failed = not all(datatype_matches(ud_datatypes[col.strip()], dt.strip()) for col, dt in zip(convert_scenario["column"], convert_scenario["datatype"]))
+
+    return read_datatypes, auto_datatypes, None if ud_failed else ud_datatypes
+
+
+def convert_datatype_chunks(file_path : str, converted_auto_dir : str, converted_ud_dir : str, convert_scenario : Dict = None, chunksize : int = 200_000) -> None:
+    # Convert a csv file which may not fit in the memory chunk by chunk, and save each converted chunk as a parquet part in the given folders
+    # First pass: the data types of all chunks are learned before any part is written, so all the parts get the same types
+    read_datatypes, auto_datatypes, ud_datatypes = learn_datatypes(file_path, convert_scenario, chunksize)
+    if not read_datatypes:
+        return
+    if convert_scenario and ud_datatypes is None:
+        logging.error("User-defined conversion failed for at least one part of the dataset, so the converted dataset is not saved!")
+
+    # Second pass: the text columns are read as text in all chunks (e.g., a number in a column which has a text in another chunk)
+    # The parts are written into temporary folders, which replace the datasets of the previous runs only after the last chunk,
+    # so a failed run does not leave a dataset with only some of the parts
+    temp_auto_dir = converted_auto_dir + ".tmp"
+    temp_ud_dir = converted_ud_dir + ".tmp"
+    remove_output(temp_auto_dir)
+    remove_output(temp_ud_dir)
+    text_columns = {col: str for col, dt in read_datatypes.items() if dt == "object"}
+    for chunk_number, chunk in enumerate(load_data_chunks(file_path, chunksize, dtype=text_columns)):
+        part_name = f"part_{chunk_number:05d}.parquet"
+        chunk = chunk.astype(read_datatypes)
+
+        # Convert data types automatically
+        data_converted = convert_datatype_learned(chunk.copy(deep=False), auto_datatypes)
+        makedirs(temp_auto_dir, exist_ok=True)
+        data_converted.to_parquet(path.join(temp_auto_dir, part_name), compression="zstd", index=False)
+
+        # Convert data types user-defined
+        if ud_datatypes is not None:
+            data_converted = convert_datatype_ud(chunk.copy(deep=False), convert_scenario).astype(ud_datatypes)
+            makedirs(temp_ud_dir, exist_ok=True)
+            data_converted.to_parquet(path.join(temp_ud_dir, part_name), compression="zstd", index=False)
+
+    # The datasets which are not converted in this run (e.g., no user-defined scenario) are removed, since they are not valid anymore
+    for temp_dir, converted_dir in [(temp_auto_dir, converted_auto_dir), (temp_ud_dir, converted_ud_dir)]:
+        remove_output(converted_dir)
+        if path.isdir(temp_dir):
+            replace(temp_dir, converted_dir)
+
+
 def main():
     # Start logging
     config_logging()
 
+    # Enable copy-on-write, so the copies below share the memory of the original data and only the columns which are changed get copied
+    pd.set_option("mode.copy_on_write", True)
+
     # Check the argument passed to the program
     # Note that the first argument is always the name of the program
     if len(sys.argv) < 2:
@@ -144,37 +339,52 @@ def main():
                 columns_datatype = sys.argv[3].split(",")
                 columns_format = sys.argv[4].split(",")
 
-    # Load the dataset
-    original_data = load_data(dataset_path)
-    # If the dataset is not valid
-    if original_data.empty:
+    convert_scenario = None
+    if columns_subset and columns_datatype and columns_format:
+        if len(columns_subset) > 0 and len(columns_datatype) > 0 and len(columns_format) > 0:
+            convert_scenario = {"column":columns_subset, "datatype":columns_datatype, "format":columns_format}
+
+    # Check the dataset before creating the output folder
+    if not path.isfile(dataset_path) and not path.isdir(dataset_path):
+        logging.error(f"The path is invalid! {dataset_path}")
         return
-    
+
     # Create a folder for cleaned datasets
     dataset_dir = path.dirname(dataset_path)
     output_dir = path.join(dataset_dir, "../", "output_convert_datatype")
-    # Remove the directory if exists because some of the files may not need to create based on the program arguments
-    if path.exists(output_dir):
-        shutil.rmtree(output_dir)
-    # Create the folder
+    # Create the folder if it does not exist (the datasets of the previous runs are replaced or removed by save_parquet)
     makedirs(output_dir, exist_ok=True)
 
-    # Convert data types automatically
-    data = original_data.copy()
-    data_converted = convert_datatype_auto(data)
-    # Save the converted dataset if the it is not empty
-    if not data_converted.empty:
-        data_converted.to_csv(path.join(output_dir, "dataset_converted_auto.csv"), index=False)
+    # The converted datasets are saved as parquet, since parquet keeps the data types and the next steps do not need to convert them again
+    # Datasets converted in memory are saved as one parquet file, and datasets converted chunk by chunk are saved
+    # as a folder with one part per chunk (dataset_converted_*.parquet), which load_data reads as one dataset
+    converted_auto_dir = path.join(output_dir, "dataset_converted_auto.parquet")
+    converted_ud_dir = path.join(output_dir, "dataset_converted_ud.parquet")
 
-    # Convert data types user-defined
-    if columns_subset and columns_datatype and columns_format:
-        if len(columns_subset) > 0 and len(columns_datatype) > 0 and len(columns_format) > 0:
-            data = original_data.copy()
-            data_converted = convert_datatype_ud(data, {"column":columns_subset, "datatype":columns_datatype, "format":columns_format})
-            # Save the converted dataset if the it is not empty
-            if not data_converted.empty:
-                data_converted.to_csv(path.join(output_dir, "dataset_converted_ud.csv"), index=False)
+    # Parquet files and csv files which fit easily in the memory are loaded at once (by pyarrow) and converted in one part
+    # Larger csv files are converted chunk by chunk to keep the memory usage bounded by the chunk size instead of the dataset size
+    chunksize = 200_000
+    max_in_memory_file_size = 512 * 1024 * 1024
+    if dataset_path.endswith(".parquet") or path.getsize(dataset_path) <= max_in_memory_file_size:
+        # Load the dataset
+        original_data = load_data(dataset_path)
+        # If the dataset is not valid
+        if original_data.empty:
+            return
+
+        # Convert data types automatically
+        data_converted = convert_datatype_auto(original_data.copy(deep=False))
+        # Save the converted dataset (it is not saved if the converted dataset is empty)
+        save_parquet(data_converted, converted_auto_dir)
+
+        # Convert data types user-defined
+        # Without a scenario, the user-defined dataset of the previous runs is removed (empty dataset)
+        data_converted = convert_datatype_ud(original_data.copy(deep=False), convert_scenario) if convert_scenario else pd.DataFrame()
+        save_parquet(data_converted, converted_ud_dir)
+        return
+
+    convert_datatype_chunks(dataset_path, converted_auto_dir, converted_ud_dir, convert_scenario, chunksize)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,11 +1,12 @@
 import pandas as pd
+import numpy as np
 import sys
 from os import path, makedirs
-import shutil
 import logging
+from concurrent.futures import ProcessPoolExecutor
+from common import config_logging, config_worker, save_data, load_data
 from typing import List
-from sklearn.preprocessing import LabelEncoder, OneHotEncoder
-import category_encoders as ce
+from sklearn.preprocessing import OneHotEncoder
 from enum import Enum
 from math import log2, ceil
 
@@ -15,103 +16,103 @@ class CategoricalEncodingMethod(Enum):
     ONEHOT_ENCODING = 2
     HASHING = 3
 
-def config_logging():
-    # This function configs logging and prepares it for logging process
-    # Note that logging creates logs from every operation has been done in the program which is the more flexible, durable, and powerful than only using print
-    # Whenever you want a new logging, just delete the existing one!
-    logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler("all_operations.log")
-    ]
-    )
-
-
-def load_data(file_path : str) -> pd.DataFrame:
-    # Open csv file and load it into a dataframe
-    try:
-        data = pd.read_csv(file_path)
-    except:
-        logging.error("The path is invalid!")
-        return pd.DataFrame()
-
-    # Return the first 5 rows of the dataset
-    logging.info(f"\n{data.head()}")
-
-    return data
-
-
 def get_observing_columns(data : pd.DataFrame, columns_subset : List) -> List:
     # Prepare observing columns
-    # Strip whitespaces
-    if columns_subset: columns_subset = [col.strip() for col in columns_subset]
-    try:
+    if columns_subset:
+        # Strip whitespaces
+        columns_subset = [col.strip() for col in columns_subset]
+        # If a subset is given, only the types of its columns are checked, so there is no need to select the categorical columns of the whole dataset
+        if not all(col in data.columns for col in columns_subset):
+            logging.error("The columns subset is not valid!")
+            return []
         # If columns_subset only has categorical columns is valid
-        categorical_columns = data.select_dtypes(exclude="number").columns
-        # If columns_subset is not None and one of its columns does not exist in categorical columns
-        if columns_subset and not all(col in categorical_columns for col in columns_subset):
+        if any(pd.api.types.is_numeric_dtype(data[col]) for col in columns_subset):
             logging.error("The columns subset contains numeric columns!")
             return []
-        else:
-            # If there is a valid subset, it is considered as the observing columns otherwise all categorical columns are considered
-            observing_columns = columns_subset if columns_subset else categorical_columns
-    except:
-        logging.error("The columns subset is not valid!")
-        return []
+        return columns_subset
 
-    return observing_columns 
+    # If there is no subset, all categorical columns are considered as the observing columns
+    return data.select_dtypes(exclude="number").columns.to_list()
 
 
-def encode_categorical(data : pd.DataFrame, categorical_encoding_method : CategoricalEncodingMethod, columns_subset : List = None) -> pd.DataFrame:
+def encode_categorical(data : pd.DataFrame, categorical_encoding_method : CategoricalEncodingMethod, columns_subset : List = None, observing_columns : List = None) -> pd.DataFrame:
     # Check if column_subset is valid
-    observing_columns = get_observing_columns(data, columns_subset)
+    # If the observing columns are already prepared by get_observing_columns (e.g., once for several encodings), the check is skipped
+    if observing_columns is None:
+        observing_columns = get_observing_columns(data, columns_subset)
     if len(observing_columns) == 0: return data
 
     match categorical_encoding_method:
         # Encode the observing columns using label encoder
         case CategoricalEncodingMethod.LABEL_ENCODING:
-            label_encoder = LabelEncoder()
             for col in observing_columns:
+                # The codes of a categorical column are the same labels as LabelEncoder gives (sorted categories), but they are computed by pandas hash table in C
+                # int32 is enough for the number of categories and takes half of the memory of int64
+                codes = pd.Categorical(data[col]).codes.astype("int32")
+                # Missing values get the code -1, so they are turned back into missing values (NaN needs a float column)
+                if (codes == -1).any():
+                    codes = np.where(codes == -1, np.nan, codes)
                 # The names of the new columns are defined and concat them to end of original columns
-                data["_".join([col, "encoded"])] = label_encoder.fit_transform(data[col])
+                data["_".join([col, "encoded"])] = codes
 
         case CategoricalEncodingMethod.ONEHOT_ENCODING:
             # Encode observing columns using one-hot encoder
-            onehot_encoder = OneHotEncoder(sparse_output=False)
+            # The output is sparse, since only one cell of the encoded columns in each row is 1
+            # uint8 is enough for 0 and 1 and takes 1/8 of the memory of the default float64
+            onehot_encoder = OneHotEncoder(sparse_output=True, dtype=np.uint8)
+            # The encoded dataframes are collected and concat to the original columns once, since each concat copies the whole dataframe
+            encoded_dfs = [data]
             for col in observing_columns:
                 # Create the encoded contents
                 encoded_columns = onehot_encoder.fit_transform(data[[col]])
                 # The column names also created by the model
                 encoded_columns_name = onehot_encoder.get_feature_names_out([col])
-                # Create a dataframe with contents and the column names
-                encoded_df = pd.DataFrame(data = encoded_columns, columns=encoded_columns_name)
-                # Concat the new datafram to end of original columns
-                data = pd.concat([data, encoded_df], axis=1)
+                # Create a dataframe with contents and the column names (the index should be the same as the original data to concat correctly)
+                # A sparse column keeps 5 bytes for each row (uint8 value + int32 position) but a dense column keeps 1 byte for each row and category
+                # So, sparse columns are only used if there are more than 5 categories
+                if len(encoded_columns_name) > 5:
+                    encoded_dfs.append(pd.DataFrame.sparse.from_spmatrix(encoded_columns, index=data.index, columns=encoded_columns_name))
+                else:
+                    encoded_dfs.append(pd.DataFrame(encoded_columns.toarray(), index=data.index, columns=encoded_columns_name))
+            # Concat the new dataframes to end of original columns
+            data = pd.concat(encoded_dfs, axis=1, copy=False)
 
         case CategoricalEncodingMethod.HASHING:
+            # The encoded dataframes are collected and concat to the original columns once (like one-hot encoding)
+            encoded_dfs = [data]
             for col in observing_columns:
                 # Find the log2 of the number of categories (number of unique values in the columns)
                 # It is the optimal number of components to reduce the collisions while having good performance
-                unique_len = len(data[col].unique())
+                unique_values = data[col].astype(str).unique()
+                unique_len = len(unique_values)
                 # Throw a warning for the less number of unique values
                 if unique_len < 10: logging.warning(f"Hashing for category number less than 10 is not reasonable (column='{col}', category number={unique_len}), and the results would not be promising!")
-                n_components=ceil(log2(unique_len))
-                # Encode the observing columns using hashing encoder
-                hashing = ce.HashingEncoder(n_components = n_components, return_df=True)
-                # Create the encoded contents
-                encoded_columns = hashing.fit_transform(data[[col]])
-                # Enhance the names for more clarification
-                encoded_columns.columns = ["_".join([col,col_gen_name]) for col_gen_name in encoded_columns.columns]
-                # Concat the new datafram to end of original columns
-                data = pd.concat([data, encoded_columns], axis=1)
+                # At least one component is needed (a column with only one category)
+                n_components = max(ceil(log2(unique_len)), 1)
+                # Only the unique values are hashed (pandas hashes them in C) and the component of each row is found by mapping its value
+                unique_components = pd.util.hash_array(unique_values.astype(object)) % n_components
+                components = data[col].astype(str).map(pd.Series(unique_components, index=unique_values)).to_numpy()
+                # Encode the observing columns by setting the component of each row to 1 (uint8 is enough for 0 and 1)
+                encoded_columns = np.zeros((len(data), n_components), dtype=np.uint8)
+                encoded_columns[np.arange(len(data)), components] = 1
+                # The names are the same as the names of the hashing encoder of category_encoders for more clarification (col_0, col_1, ...)
+                encoded_columns_name = ["_".join([col, f"col_{i}"]) for i in range(n_components)]
+                encoded_dfs.append(pd.DataFrame(encoded_columns, index=data.index, columns=encoded_columns_name))
+            # Concat the new dataframes to end of original columns
+            data = pd.concat(encoded_dfs, axis=1, copy=False)
 
     return data
 
+def encode_and_save(data : pd.DataFrame, categorical_encoding_method : CategoricalEncodingMethod, observing_columns : List, file_path : str):
+    # Encode categorical columns and save the encoded dataset (main runs it in a worker process for each encoding method)
+    data_converted = encode_categorical(data, categorical_encoding_method, observing_columns=observing_columns)
+    # Save the converted dataset (it is not saved if the converted dataset is empty)
+    save_data(data_converted, file_path)
+
+
 def main():
     # Start logging
-    config_logging()
+    log_queue = config_logging()
 
     # Check the argument passed to the program
     # Note that the first argument is always the name of the program
@@ -141,33 +142,26 @@ def main():
     # Create a folder for cleaned datasets
     dataset_dir = path.dirname(dataset_path)
     output_dir = path.join(dataset_dir, "../", "output_encode_categorical")
-    # Remove the directory if exists because some of the files may not need to create based on the program arguments
-    if path.exists(output_dir):
-        shutil.rmtree(output_dir)
-    # Create the folder
+    # Create the folder if it does not exist (the files of the previous runs are replaced or removed by save_data)
     makedirs(output_dir, exist_ok=True)
 
-    # Encode categorical columns by label encoding
-    data = original_data.copy()
-    data_converted = encode_categorical(data, CategoricalEncodingMethod.LABEL_ENCODING, columns_subset=columns_subset)
-    # Save the converted dataset if the it is not empty
-    if not data_converted.empty:
-        data_converted.to_csv(path.join(output_dir, "dataset_label_encoding.csv"), index=False)
-
-    # Encode categorical columns by onehot encoding
-    data = original_data.copy()
-    data_converted = encode_categorical(data, CategoricalEncodingMethod.ONEHOT_ENCODING, columns_subset=columns_subset)
-    # Save the converted dataset if the it is not empty
-    if not data_converted.empty:
-        data_converted.to_csv(path.join(output_dir, "dataset_onehot_encoding.csv"), index=False)
-
-    # Encode categorical columns by hashing
-    data = original_data.copy()
-    data_converted = encode_categorical(data, CategoricalEncodingMethod.HASHING, columns_subset=columns_subset)
-    # Save the converted dataset if the it is not empty
-    if not data_converted.empty:
-        data_converted.to_csv(path.join(output_dir, "dataset_hashing.csv"), index=False)
-
+    # Prepare the observing columns once, since they are the same for all the encodings
+    observing_columns = get_observing_columns(original_data, columns_subset)
+
+    # The encodings are independent of each other, so each of them runs in a separate process in parallel
+    # Each process gets its own copy of the dataset, so there is no need to copy it here
+    # Copy-on-write is enabled in the processes by config_worker, so the encoded datasets share the memory of the original columns of that copy (e.g., in concat)
+    encoding_file_names = {
+        CategoricalEncodingMethod.LABEL_ENCODING: "dataset_label_encoding.csv",
+        CategoricalEncodingMethod.ONEHOT_ENCODING: "dataset_onehot_encoding.csv",
+        CategoricalEncodingMethod.HASHING: "dataset_hashing.csv"
+    }
+    with ProcessPoolExecutor(max_workers=len(encoding_file_names), initializer=config_worker, initargs=(log_queue,)) as executor:
+        futures = [executor.submit(encode_and_save, original_data, categorical_encoding_method, observing_columns, path.join(output_dir, file_name))
+                   for categorical_encoding_method, file_name in encoding_file_names.items()]
+        # Wait for all the encodings (an exception in a process is raised here)
+        for future in futures:
+            future.result()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,40 +1,13 @@
 import pandas as pd
 import numpy as np
 import sys
-from os import path, makedirs
-import shutil
+from os import path, makedirs, remove, replace
 import logging
+from common import config_logging, save_data, load_data
 from typing import List, Tuple
-from rapidfuzz import fuzz
-from itertools import combinations
-
-def config_logging():
-    # This function configs logging and prepares it for logging process
-    # Note that logging creates logs from every operation has been done in the program which is the more flexible, durable, and powerful than only using print
-    # Whenever you want a new logging, just delete the existing one!
-    logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler("all_operations.log")
-    ]
-    )
-
-
-def load_data(file_path : str) -> pd.DataFrame:
-    # Open csv file and load it into a dataframe
-    try:
-        data = pd.read_csv(file_path)
-    except:
-        logging.error("The path is invalid!")
-        return pd.DataFrame()
-
-    # Return the first 5 rows of the dataset
-    logging.info(f"\n{data.head()}")
-
-    return data
-
+from rapidfuzz import fuzz, process, utils
+from scipy.cluster.hierarchy import DisjointSet
+from concurrent.futures import ThreadPoolExecutor
 
 def handle_duplicate_values_exact(data : pd.DataFrame, subset : List = None) -> pd.DataFrame:
     # Check dataset to know how many duplicate values exist
@@ -49,27 +22,143 @@ def handle_duplicate_values_exact(data : pd.DataFrame, subset : List = None) ->
         logging.error("The columns subset is not valid!")
         return pd.DataFrame()
     
+    # Each group of duplicates gets one id, so the rows are compared only once for both finding and removing duplicates
+    # The values themselves are compared (not only their hashes), so values of different types (e.g., 1 and '1') are not merged
+    # Subset is list of column names which we want to participate in the duplicate recognition
+    # If it is None, all column values of a row should be the same as other's to consider as duplicates
+    # dropna=False: missing values are considered equal to each other (like data.duplicated())
+    group_ids = data.groupby(subset if subset else list(data.columns), sort=False, dropna=False).ngroup()
+
     # Find duplicate values
         # keep='first' (default): Marks duplicates as True, except for the first occurrence.
         # keep='last': Marks duplicates as True, except for the last occurrence.
         # keep=False: Marks all duplicates (including the first and last) as True.
-    data_duplicated = data.duplicated(keep=False, subset=subset)
+    data_duplicated = group_ids.duplicated(keep=False)
     logging.info(f"Dataset has {data.shape[0]} rows before handling duplicate values.\nTop 10 of duplicate values are (Totally {data_duplicated.sum()} rows - including all duplicates, but from each group first one will remain and others will be removed):\n{data[data_duplicated].head(10)}")
 
     # Remove duplicate values
-    # Subset is list of column names which we want to participate in the duplicate recognition
-    # If it is None, all column values of a row should be the same as other's to consider as duplicates
     # here we use keep='first' (default), since we need to keep the first one from each group of duplicates
-    data = data.drop_duplicates(subset=subset)
+    data = data[~group_ids.duplicated(keep="first")]
 
     # Check dataset rows after removing duplicate rows
-    logging.info(f"Dataset has {data.shape[0]} rows before handling duplicate values.")
+    logging.info(f"Dataset has {data.shape[0]} rows after handling duplicate values.")
 
     return data
 
 
-def handle_duplicate_values_fuzzy(data : pd.DataFrame, subset : List = None, ratio_range : Tuple = None) -> pd.DataFrame:
-    # Note that if ratio_range(100,100) is given to the function, the results are identical to handle_duplicate_values_drop() function
+def handle_duplicate_values_exact_chunks(file_path : str, output_file_path : str, subset : List = None, chunksize : int = 200_000) -> int:
+    # Remove exact duplicates of a csv file which may not fit in the memory, and write the result to output_file_path
+    # The file is read chunk by chunk and only the values of the unique rows (of subset) which are already seen are kept in the memory
+    # Note that all values are read as text, so the values of a row are the same in all chunks (e.g., the type of a column is not inferred differently per chunk)
+    try:
+        reader = pd.read_csv(file_path, chunksize=chunksize, dtype=str)
+    except (OSError, ValueError) as e:
+        # Only the expected errors are handled (e.g., file not found or not a valid csv), others (e.g., MemoryError) are raised
+        logging.error(f"The path is invalid! {e}")
+        return 0
+
+    # The rows are written into a temporary file first, which is renamed to output_file_path after the last chunk (like save_data),
+    # so a failed run does not leave a dataset with only some of the chunks
+    temp_file_path = output_file_path + ".tmp"
+    seen_keys = set()
+    rows_count = 0
+    remained_rows_count = 0
+    with reader:
+        for chunk_number, chunk in enumerate(reader):
+            # Check if column_subset is valid (it is checked once, on the first chunk)
+            if chunk_number == 0 and subset:
+                # Strip whitespaces
+                subset = [col.strip() for col in subset]
+                if not all(col in chunk.columns for col in subset):
+                    logging.error("The columns subset is not valid!")
+                    if path.exists(temp_file_path):
+                        remove(temp_file_path)
+                    return 0
+
+            rows_count += chunk.shape[0]
+            # First rows of each group of duplicates inside the chunk
+            chunk = chunk[~chunk.duplicated(subset=subset)]
+            # The rows are kept as tuples of their values (not only their hashes), so two different rows are never merged
+            # Missing values become None, so they are equal to each other (like data.duplicated())
+            key_columns = chunk[subset] if subset else chunk
+            row_keys = list(key_columns.astype(object).where(key_columns.notna(), None).itertuples(index=False, name=None))
+            # Only the rows which are not seen in the previous chunks remain
+            is_new = np.fromiter((key not in seen_keys for key in row_keys), dtype=bool, count=len(row_keys))
+            seen_keys.update(key for key, new in zip(row_keys, is_new) if new)
+            chunk = chunk[is_new]
+
+            # The header is only written with the first chunk and the next chunks are appended
+            chunk.to_csv(temp_file_path, mode="w" if chunk_number == 0 else "a", header=chunk_number == 0, index=False)
+            remained_rows_count += chunk.shape[0]
+
+    # If the file has no rows, the file of the previous runs is removed, since it is not valid anymore (like save_data)
+    if remained_rows_count == 0:
+        for file in [temp_file_path, output_file_path]:
+            if path.exists(file):
+                remove(file)
+    else:
+        replace(temp_file_path, output_file_path)
+    logging.info(f"Dataset has {rows_count} rows before and {remained_rows_count} rows after handling duplicate values.")
+
+    return remained_rows_count
+
+
+def find_duplicated_pairs(data : pd.DataFrame, comparison_columns : List, ratio_range : Tuple, workers : int = -1) -> Tuple[np.ndarray, np.ndarray]:
+    # Find the positions (i, j) of all the pairs of rows whose average similarity ratio is in ratio_range (i < j)
+    # workers is the number of threads of cdist (-1 means all cores)
+
+    # Only the unique values of each column are compared (e.g., a city column has a few unique values),
+    # and the ratios are expanded to the pairs of rows by the codes of the values
+    rows_count = data.shape[0]
+    columns_codes, columns_unique_values = [], []
+    for col in comparison_columns:
+        codes, unique_values = pd.factorize(data[col].astype(str))
+        columns_codes.append(codes)
+        columns_unique_values.append(unique_values.to_numpy())
+
+    # The average of k columns can reach ratio_range[0] only if each column has at least k * ratio_range[0] - (k - 1) * 100
+    # So, cdist stops comparing two values as soon as their ratio can not reach this cutoff (score_cutoff), and returns 0 for them
+    columns_count = len(comparison_columns)
+    column_score_cutoff = max(columns_count * ratio_range[0] - (columns_count - 1) * 100, 0)
+
+    # Rows are compared block by block (block rows x all rows), so the memory does not grow with rows^2 (e.g., 40GB for 100k rows)
+    # and only the positions of the pairs which are in range are kept
+    block_rows_count = max(10_000_000 // max(rows_count, 1), 1)
+    rows_i_list, rows_j_list = [], []
+    for block_start in range(0, rows_count, block_rows_count):
+        block_end = min(block_start + block_rows_count, rows_count)
+        # Similarity ratios of the block rows with all rows are calculated column by column with rapidfuzz cdist (in C++ and on all cores),
+        # instead of calling fuzz.ratio for each pair in a python loop
+        # The ratios of all comparison columns are summed up in one matrix (block rows x all rows)
+        block_similarity_sum_ratio = np.zeros((block_end - block_start, rows_count), dtype=np.float32)
+        for codes, unique_values in zip(columns_codes, columns_unique_values):
+            # Unique values of the block are compared with all the unique values of the column
+            block_unique_codes, block_codes = np.unique(codes[block_start:block_end], return_inverse=True)
+            # token_set_ratio ignores the order and repetition of words (e.g., in names)
+            # default_process normalizes the values (lower case, strip and remove punctuation) inside rapidfuzz
+            unique_similarity_ratio = process.cdist(unique_values[block_unique_codes].tolist(), unique_values.tolist(), scorer=fuzz.token_set_ratio, processor=utils.default_process, score_cutoff=column_score_cutoff, dtype=np.float32, workers=workers)
+            # Rows with the same code have exactly equal values, so their ratio is 100 without comparing the strings
+            # (otherwise values which become empty after processing, e.g., "-" or "", get 0 with themselves)
+            unique_similarity_ratio[np.arange(len(block_unique_codes)), block_unique_codes] = 100
+            block_similarity_sum_ratio += unique_similarity_ratio[np.ix_(block_codes, codes)]
+
+        # Average of similarity ratios of all column is caculated.
+        block_similarity_avg_ratio = block_similarity_sum_ratio / columns_count
+        # If the result is in range, those rows will be considered as duplicates
+        # Only the pairs with j > i are used (upper triangle), since each unique non-ordered combination of the rows is needed once
+        duplicated_pairs = np.triu((ratio_range[0] <= block_similarity_avg_ratio) & (block_similarity_avg_ratio <= ratio_range[1]), k=block_start + 1)
+        block_i, block_j = np.nonzero(duplicated_pairs)
+        rows_i_list.append(block_i + block_start)
+        rows_j_list.append(block_j)
+
+    if not rows_i_list:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    return np.concatenate(rows_i_list), np.concatenate(rows_j_list)
+
+
+def handle_duplicate_values_fuzzy(data : pd.DataFrame, subset : List = None, ratio_range : Tuple = None, blocking_column : str = None) -> pd.DataFrame:
+    # Note that if ratio_range(100,100) is given to the function, the results are close to handle_duplicate_values_exact() function,
+    # but values which differ only in case, punctuation or order of words (e.g., "Smith, Alice" and "alice smith") are also duplicates
 
     # Check if column_subset is valid
     try:
@@ -80,6 +169,13 @@ def handle_duplicate_values_fuzzy(data : pd.DataFrame, subset : List = None, rat
     except:
         logging.error("The columns subset is not valid!")
         return pd.DataFrame()
+
+    # Check if blocking_column is valid
+    if blocking_column:
+        blocking_column = blocking_column.strip()
+        if blocking_column not in data.columns:
+            logging.error("The blocking column is not valid!")
+            return pd.DataFrame()
     
     # If ratio_range is not passed to the function it will be considered as (90,100)
     if ratio_range is None:
@@ -90,45 +186,36 @@ def handle_duplicate_values_fuzzy(data : pd.DataFrame, subset : List = None, rat
     comparison_columns = subset if subset else data.columns
 
 
-    # This is a list containing sets of indexes. each set is for a group of duplicates.
-    data_duplicated_sets = []
-    # This is a list containing the similarity ratios of each column of under-comparison rows
-    column_similarity_ratios = []
-    # Iteration is on every unique non-ordered combination of the row indexes
-    for i, j in combinations(data.index, 2):
-        # For each comparison column, similarity ratio is calculated
-        for col in comparison_columns:
-            # The result is stored in ratios list
-            column_similarity_ratios.append(fuzz.ratio(str(data.loc[i, col]).lower().strip(), str(data.loc[j, col]).lower().strip()))
-        
-        # Average of similarity ratios of all column is caculated.
-        rows_similarity_avg_ratio = sum(column_similarity_ratios)/len(column_similarity_ratios)
-        # If the result is in range, those rows will be considered as duplicates
-        if ratio_range[0] <= rows_similarity_avg_ratio <= ratio_range[1]:
-            # If it is the first group of duplicates, we add them without question
-            if len(data_duplicated_sets) == 0:
-                # Create a new set and add it to the list
-                new_duplicated_set = set([i, j])
-                data_duplicated_sets.append(new_duplicated_set)
-            else:
-                # It shows if we need to create a new set or add the indexes to the existing one
-                new_set = True
-                # We search if each item of our newly found pair is in the existing sets
-                for d_set in data_duplicated_sets:
-                    # If they exist, simply add both of them to the set
-                    if i in d_set or j in d_set:
-                        d_set.add(i)
-                        d_set.add(j)
-                        # No need to create a new set
-                        new_set = False
-                        break
-                if new_set:
-                    # If they don't exist, we need to create a new set of duplicates and add it to list
-                    new_duplicated_set = set([i, j])
-                    data_duplicated_sets.append(new_duplicated_set)
-        
-        # For each combination of rows, we need fresh ration list
-        column_similarity_ratios.clear()
+    if not blocking_column:
+        # All the rows are compared with each other
+        rows_i, rows_j = find_duplicated_pairs(data=data, comparison_columns=comparison_columns, ratio_range=ratio_range)
+    else:
+        # Rows are only compared inside their block (rows with the same first 3 characters of the blocking column),
+        # which reduces the number of comparisons from n^2 to sum of (block size)^2 for large datasets
+        block_keys = data[blocking_column].astype(str).str.lower().str.strip().str[:3]
+        # indices gives the positions of the rows in each block
+        # A block with one row has no pair
+        blocks = [block_positions for block_positions in block_keys.groupby(block_keys, sort=False).indices.values() if len(block_positions) > 1]
+        # Blocks are independent, so they are compared in parallel threads (one block per thread, cdist releases the GIL while comparing)
+        # Threads are used instead of processes, since the dataset does not need to be copied to each of them
+        with ThreadPoolExecutor() as executor:
+            blocks_pairs = executor.map(lambda block_positions: find_duplicated_pairs(data=data.iloc[block_positions], comparison_columns=comparison_columns, ratio_range=ratio_range, workers=1), blocks)
+            rows_i_list, rows_j_list = [], []
+            for block_positions, (block_i, block_j) in zip(blocks, blocks_pairs):
+                # Positions inside the block are converted to the positions in the dataset
+                rows_i_list.append(block_positions[block_i])
+                rows_j_list.append(block_positions[block_j])
+        rows_i = np.concatenate(rows_i_list) if rows_i_list else np.array([], dtype=np.int64)
+        rows_j = np.concatenate(rows_j_list) if rows_j_list else np.array([], dtype=np.int64)
+
+    # Pairs of duplicates are merged into groups with a disjoint set (union-find), so that groups which share a row
+    # are also merged together (e.g., if a~b and c~d are found first, b~c merges both groups into one)
+    disjoint_set = DisjointSet(data.index)
+    # Iteration is on every pair of row indexes which are duplicates (positions are converted to the index labels)
+    for i, j in zip(data.index[rows_i], data.index[rows_j]):
+        disjoint_set.merge(i, j)
+    # This is a list containing sets of indexes. each set is for a group of duplicates (rows without any duplicate are single sets).
+    data_duplicated_sets = [d_set for d_set in disjoint_set.subsets() if len(d_set) > 1]
 
     # Based on the logic in handle_duplicate_values_drop() function, we show all the duplicated rows to the user (keep = False),
     # but should not eliminate the first duplicated row (keep='first')
@@ -137,11 +224,11 @@ def handle_duplicate_values_fuzzy(data : pd.DataFrame, subset : List = None, rat
     data_duplicated_set_drop = set()
     for d_set in data_duplicated_sets:
         # Union all the sets of indexes (each group of duplicates) into one set, for further operations
-        data_duplicated_set_show = data_duplicated_set_show.union(d_set)
-        # Remove the first element of each group and union the others into one set
-        first_duplicate = sorted(list(d_set))[0]
-        d_set.remove(first_duplicate)
-        data_duplicated_set_drop = data_duplicated_set_drop.union(d_set)
+        # Note that |= adds to the existing set instead of creating a new one each time
+        data_duplicated_set_show |= d_set
+        # Keep the first element of each group and union the others into one set
+        first_duplicate = min(d_set)
+        data_duplicated_set_drop |= d_set - {first_duplicate}
 
     # Convert sets to sorted lists
     data_duplicated_index_show = sorted(list(data_duplicated_set_show))
@@ -149,7 +236,7 @@ def handle_duplicate_values_fuzzy(data : pd.DataFrame, subset : List = None, rat
 
     # Check dataset to know how many duplicate values exist
     # Find duplicate values
-    logging.info(f"Dataset has {data.shape[0]} rows before handling duplicate values.\nTop 10 of duplicate values are (Totally {len(data_duplicated_index_show)} rows - including all duplicates, but from each group first one will remain and others will be removed):\n{data.iloc[data_duplicated_index_show].head(10)}")
+    logging.info(f"Dataset has {data.shape[0]} rows before handling duplicate values.\nTop 10 of duplicate values are (Totally {len(data_duplicated_index_show)} rows - including all duplicates, but from each group first one will remain and others will be removed):\n{data.loc[data_duplicated_index_show].head(10)}")
 
     # Remove duplicate values
     data = data.drop(data_duplicated_index_drop)
@@ -175,6 +262,7 @@ def main():
                 dataset_path = sys.argv[1]
                 duplicate_columns_subset = None
                 ratio_range = None
+                blocking_column = None
             case 3:
                 dataset_path = sys.argv[1]
                 # This parameter should pass to the program in comma seperated format e.g., "First Name,Last Name" (Obviously column names are case-sebsitive)
@@ -183,6 +271,7 @@ def main():
                 else:
                     duplicate_columns_subset = sys.argv[2].split(",")
                 ratio_range = None
+                blocking_column = None
             case 4:
                 dataset_path = sys.argv[1]
                 # This parameter should pass to the program in comma seperated format e.g., "First Name,Last Name" (Obviously column names are case-sebsitive)
@@ -192,36 +281,57 @@ def main():
                     duplicate_columns_subset = sys.argv[2].split(",")
                 # Ratio range should be passed as a tuple e.g., 80,90
                 ratio_range = tuple([int(item) for item in sys.argv[3].split(",")])
+                blocking_column = None
+            case 5:
+                dataset_path = sys.argv[1]
+                # This parameter should pass to the program in comma seperated format e.g., "First Name,Last Name" (Obviously column names are case-sebsitive)
+                if sys.argv[2] == "None":
+                    duplicate_columns_subset = None
+                else:
+                    duplicate_columns_subset = sys.argv[2].split(",")
+                # Ratio range should be passed as a tuple e.g., 80,90
+                ratio_range = tuple([int(item) for item in sys.argv[3].split(",")])
+                # Fuzzy comparisons are only done between rows with the same first 3 characters of this column e.g., "Last Name"
+                blocking_column = sys.argv[4]
 
 
-    # Load the dataset
-    original_data = load_data(dataset_path)
-    # If the dataset is not valid
-    if original_data.empty:
+    # Check the dataset before creating the output folder
+    if not path.isfile(dataset_path) and not path.isdir(dataset_path):
+        logging.error(f"The path is invalid! {dataset_path}")
         return
-    
+
     # Create a folder for cleaned datasets
     dataset_dir = path.dirname(dataset_path)
     output_dir = path.join(dataset_dir, "../", "output_handle_duplicate_values")
-    # Remove the directory if exists because some of the files may not need to create based on the program arguments
-    if path.exists(output_dir):
-        shutil.rmtree(output_dir)
-    # Create the folder
+    # Create the folder if it does not exist (the files of the previous runs are replaced or removed by save_data)
     makedirs(output_dir, exist_ok=True)
 
+    # Csv files which do not fit easily in the memory are handled chunk by chunk (like convert_datatype), so only the exact method is applied
+    # The fuzzy method compares the rows with each other and needs the whole dataset, so it is skipped and its previous output is removed
+    max_in_memory_file_size = 512 * 1024 * 1024
+    if not dataset_path.endswith(".parquet") and path.getsize(dataset_path) > max_in_memory_file_size:
+        handle_duplicate_values_exact_chunks(dataset_path, path.join(output_dir, "dataset_cleaned_drop.csv"), subset=duplicate_columns_subset)
+        logging.warning("The dataset is too large for the fuzzy method, so only the exact duplicates are handled!")
+        save_data(pd.DataFrame(), path.join(output_dir, "dataset_cleaned_fuzzy.csv"))
+        return
+
+    # Load the dataset
+    original_data = load_data(dataset_path)
+    # If the dataset is not valid
+    if original_data.empty:
+        return
+
+    # Note that both methods do not change the given dataset and return a new one, so the original data is passed without copy
+
     # Handle duplicate values using drop method
-    data = original_data.copy()
-    data_cleaned_drop = handle_duplicate_values_exact(data=data, subset=duplicate_columns_subset)
-    # Save the cleaned dataset by dropping rows if the cleaned dataset is not empty
-    if not data_cleaned_drop.empty:
-        data_cleaned_drop.to_csv(path.join(output_dir, "dataset_cleaned_drop.csv"), index=False)
+    data_cleaned_drop = handle_duplicate_values_exact(data=original_data, subset=duplicate_columns_subset)
+    # Save the cleaned dataset by dropping rows (it is not saved if the cleaned dataset is empty)
+    save_data(data_cleaned_drop, path.join(output_dir, "dataset_cleaned_drop.csv"))
 
     # Handle duplicate values using fuzzy method
-    data = original_data.copy()
-    data_cleaned_fuzzy = handle_duplicate_values_fuzzy(data=data, subset=duplicate_columns_subset, ratio_range = ratio_range)  
-    # Save the cleaned dataset by dropping rows if the cleaned dataset is not empty
-    if not data_cleaned_fuzzy.empty:
-        data_cleaned_fuzzy.to_csv(path.join(output_dir, "dataset_cleaned_fuzzy.csv"), index=False)
+    data_cleaned_fuzzy = handle_duplicate_values_fuzzy(data=original_data, subset=duplicate_columns_subset, ratio_range = ratio_range, blocking_column=blocking_column)  
+    # Save the cleaned dataset by dropping rows (it is not saved if the cleaned dataset is empty)
+    save_data(data_cleaned_fuzzy, path.join(output_dir, "dataset_cleaned_fuzzy.csv"))
 
 
 if __name__ == "__main__":
@@ -1,9 +1,14 @@
 import pandas as pd
+import numpy as np
 from enum import Enum
 import sys
-from os import path, makedirs
-import shutil
+from os import path, makedirs, environ
 import logging
+import multiprocessing
+from common import config_logging, config_worker, save_data, load_data, load_parquet
+from typing import List
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from tempfile import TemporaryDirectory
 
 
 class AdjacentImputationMethod(Enum):
@@ -22,30 +27,13 @@ class NumericDatatypeImputationMethod(Enum):
     MODE = 3
 
 
-def config_logging():
-    # This function configs logging and prepares it for logging process
-    # Note that logging creates logs from every operation has been done in the program which is the more flexible, durable, and powerful than only using print
-    # Whenever you want a new logging, just delete the existing one!
-    logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler("all_operations.log")
-    ]
-    )
-
-
-def load_data(file_path : str) -> pd.DataFrame:
-    # Open csv file and load it into a dataframe
-    try:
-        data = pd.read_csv(file_path)
-    except:
-        logging.error("The path is invalid!")
-        return pd.DataFrame()
-
-    # Return the first 5 rows of the dataset
-    logging.info(f"\n{data.head()}")
+def convert_to_category(data : pd.DataFrame) -> pd.DataFrame:
+    # Text columns with few unique values (e.g., country or language) are stored as category, which keeps each text once
+    # and the rows only keep small integer codes, so the dataset and its copies for each method need much less memory
+    # Only columns with less than 10% unique values are converted, since a column with more categories saves little memory
+    for col in data.select_dtypes(include="object").columns:
+        if data[col].nunique() < 0.1 * len(data):
+            data[col] = data[col].astype("category")
 
     return data
 
@@ -53,7 +41,9 @@ def load_data(file_path : str) -> pd.DataFrame:
 def handle_missing_values_drop(data: pd.DataFrame) -> pd.DataFrame:
     # Check for missing values
     # It is also possible to use isnull() instead of isna()
-    logging.info(f"Dataset has {data.shape[0]} rows before handling missing values.\nMissing values are:\n{data.isna().sum()}")
+    # Counting the missing values scans the whole dataset, so it is done only if the log is written (e.g., not when the logging level is WARNING)
+    if logging.getLogger().isEnabledFor(logging.INFO):
+        logging.info(f"Dataset has {data.shape[0]} rows before handling missing values.\nMissing values are:\n{data.isna().sum()}")
 
     # Drop all rows containing missing values
     data = data.dropna()
@@ -64,26 +54,54 @@ def handle_missing_values_drop(data: pd.DataFrame) -> pd.DataFrame:
     return data
 
 
-def handle_missing_values_datatype_imputation(data : pd.DataFrame, numeric_datatype_imputation_method : NumericDatatypeImputationMethod) -> pd.DataFrame:
+def get_numeric_columns(data : pd.DataFrame) -> List:
+    # Return the numeric columns, which are the only columns that mean, median and interpolation can be applied to
+    return data.select_dtypes(include="number").columns.to_list()
+
+
+def get_missing_columns(data : pd.DataFrame) -> List:
+    # Return the columns which have missing values, which are the only columns that need to be filled
+    has_missing = data.isna().any()
+    return has_missing.index[has_missing].to_list()
+
+
+def first_modes(data : pd.DataFrame) -> pd.Series:
+    # Return the first mode of each column (the modes of a dataframe are sorted, so it is the smallest one like data[col].mode()[0])
+    # If no column has any value, there is no mode and nothing is filled
+    modes = data.mode()
+    return modes.iloc[0] if not modes.empty else pd.Series(dtype=object)
+
+
+def handle_missing_values_datatype_imputation(data : pd.DataFrame, numeric_datatype_imputation_method : NumericDatatypeImputationMethod, numeric_columns : List = None, categorical_fill_values : pd.Series = None) -> pd.DataFrame:
+    # Parameter numeric_columns can be given if it is already known (e.g., main() selects it once for all methods), otherwise it is selected here
+    # Parameter categorical_fill_values (the modes of the categorical columns) can also be given, since it is the same for all numeric methods, otherwise it is calculated here
     # Check for missing values
     # It is also possible to use isnull() instead of isna()
-    logging.info(f"Dataset has {data.shape[0]} rows before handling missing values.\nMissing values are:\n{data.isna().sum()}")
-
-    for col in data.columns:
-        # Check if the columns is numeric
-        if pd.api.types.is_numeric_dtype(data[col]):
-            match numeric_datatype_imputation_method:
-                case NumericDatatypeImputationMethod.MEAN:
-                    data[col] = data[col].fillna(data[col].mean())
-                case NumericDatatypeImputationMethod.MEDIAN:
-                    data[col] = data[col].fillna(data[col].median())
-                case NumericDatatypeImputationMethod.MODE:
-                    # Note that in this case, mode method returns a data serie which contains all modes, so we need to take the first one
-                    data[col] = data[col].fillna(data[col].mode()[0])
-        else:
-            # If it is a categorical columns
-            # Note that in this case, mode method returns a data serie which contains all modes, so we need to take the first one
-            data[col] = data[col].fillna(data[col].mode()[0])
+    # Counting the missing values scans the whole dataset, so it is done only if the log is written (e.g., not when the logging level is WARNING)
+    if logging.getLogger().isEnabledFor(logging.INFO):
+        logging.info(f"Dataset has {data.shape[0]} rows before handling missing values.\nMissing values are:\n{data.isna().sum()}")
+
+    # The fill values of all columns are calculated together (one call per group of columns instead of one per column)
+    # Only the columns with missing values are considered, since the other columns (usually most of them) need no fill value
+    if numeric_columns is None:
+        numeric_columns = get_numeric_columns(data)
+    missing_columns = get_missing_columns(data)
+    numeric_columns = [col for col in numeric_columns if col in missing_columns]
+    categorical_columns = [col for col in missing_columns if col not in numeric_columns]
+    match numeric_datatype_imputation_method:
+        case NumericDatatypeImputationMethod.MEAN:
+            numeric_fill_values = data[numeric_columns].mean()
+        case NumericDatatypeImputationMethod.MEDIAN:
+            numeric_fill_values = data[numeric_columns].median()
+        case NumericDatatypeImputationMethod.MODE:
+            # Note that in this case, mode method returns a dataframe which contains all modes of each column, so we need to take the first row
+            numeric_fill_values = first_modes(data[numeric_columns])
+    # If it is a categorical columns, "MODE" is the only option
+    if categorical_fill_values is None:
+        categorical_fill_values = first_modes(data[categorical_columns])
+
+    # All the columns are filled in one call
+    data = data.fillna({**numeric_fill_values.to_dict(), **categorical_fill_values.to_dict()})
 
     # Check dataset after dropping missing values
     logging.info(f"Dataset has {data.shape[0]} rows after handling missing values.")
@@ -91,30 +109,40 @@ def handle_missing_values_datatype_imputation(data : pd.DataFrame, numeric_datat
     return data
 
 
-def handle_missing_values_adjacent_value_imputation(data: pd.DataFrame, adjancent_imputation_method : AdjacentImputationMethod, time_reference_col : str = "") -> pd.DataFrame:
+def handle_missing_values_adjacent_value_imputation(data: pd.DataFrame, adjancent_imputation_method : AdjacentImputationMethod, time_reference_col : str = "", numeric_columns : List = None) -> pd.DataFrame:
+    # Parameter numeric_columns can be given if it is already known (e.g., main() selects it once for all methods), otherwise it is selected here
     # Check for missing values
     # It is also possible to use isnull() instead of isna()
-    logging.info(f"Dataset has {data.shape[0]} rows before handling missing values.\nMissing values are:\n{data.isna().sum()}")
+    # Counting the missing values scans the whole dataset, so it is done only if the log is written (e.g., not when the logging level is WARNING)
+    if logging.getLogger().isEnabledFor(logging.INFO):
+        logging.info(f"Dataset has {data.shape[0]} rows before handling missing values.\nMissing values are:\n{data.isna().sum()}")
+
+    # The filled columns are assigned back to the dataset, so it is copied first to keep the caller's dataset unchanged
+    # The copy is shallow (deep=False), so it does not duplicate the data and only the assigned columns are replaced in the copy
+    data = data.copy(deep=False)
 
     # Fill missing values using adjacent value imputation
+    # Only the columns with missing values are filled, since the other columns (usually most of them) stay the same
+    missing_columns = get_missing_columns(data)
     match adjancent_imputation_method:
         case AdjacentImputationMethod.FORWARD:
             # Fill missing values using forward fill (Note that fillna(method='ffill') method is deprecated)
-            data = data.ffill()
+            data[missing_columns] = data[missing_columns].ffill()
 
         case AdjacentImputationMethod.BACKWARD:
             # Fill missing values using backward fill (Note that fillna(method='bfill') method is deprecated)
-            data = data.bfill()
+            data[missing_columns] = data[missing_columns].bfill()
 
         case AdjacentImputationMethod.INTERPOLATION_LINEAR:
             # Note that this method does not handle missing values in string columns, 
             # so it is needed to combine it with other methods to handle missing values also in string columns
 
             # Fill missing values using linear interpolation (Default method is linear)
-            for col in data.columns:
-                # Check if the column is numeric
-                if pd.api.types.is_numeric_dtype(data[col]):
-                    data[col] = data[col].interpolate(method='linear')
+            # All the numeric columns are interpolated together in one call instead of column by column
+            if numeric_columns is None:
+                numeric_columns = get_numeric_columns(data)
+            numeric_columns = [col for col in numeric_columns if col in missing_columns]
+            data[numeric_columns] = data[numeric_columns].interpolate(method='linear')
 
         case AdjacentImputationMethod.INTERPOLATION_TIME:
             # Note that this method does not handle missing values in string columns, 
@@ -132,17 +160,30 @@ def handle_missing_values_adjacent_value_imputation(data: pd.DataFrame, adjancen
                     logging.error(f"The column '{time_reference_col}' is not in datetime format. This method needs a DataTime column to operate.")
                     return pd.DataFrame()
                 
-            # Change in index column to time reference column, as it is needed for time interpolation
-            data = data.set_index(time_reference_col)
-
             # Fill missing values using time interpolation
-            for col in data.columns:
-                # Check if the column is numeric
-                if pd.api.types.is_numeric_dtype(data[col]):
-                    data[col] = data[col].interpolate(method='time')
-            
-            # Reset index to original
-            data = data.reset_index()
+            # The time values are used directly as the x values of np.interp (like interpolate(method='time') does with a DatetimeIndex),
+            # so the dataset is not re-indexed by the time reference column and reset back (which copies the index and all the columns twice)
+            if numeric_columns is None:
+                numeric_columns = get_numeric_columns(data)
+            time_values = data[time_reference_col].astype("int64").to_numpy()
+            # Rows without a time (NaT, which becomes the smallest int64) are neither used for the interpolation nor filled, so they stay missing
+            has_time = data[time_reference_col].notna().to_numpy()
+            for col in numeric_columns:
+                if col == time_reference_col or col not in missing_columns:
+                    continue
+                values = data[col].to_numpy(dtype=np.float64, na_value=np.nan, copy=True)
+                missing = np.isnan(values)
+                valid = ~missing & has_time
+                missing &= has_time
+                # Columns without missing values (or without any value) are left unchanged
+                if not missing.any() or not valid.any():
+                    continue
+                # Like interpolate(), the missing values before the first valid value are not filled
+                missing[:valid.argmax()] = False
+                # np.interp needs increasing x values, so the valid values are sorted by their time
+                order = np.argsort(time_values[valid], kind="stable")
+                values[missing] = np.interp(time_values[missing], time_values[valid][order], values[valid][order])
+                data[col] = values
 
     # Check dataset after dropping missing values
     logging.info(f"Dataset has {data.shape[0]} rows after handling missing values.")
@@ -150,9 +191,29 @@ def handle_missing_values_adjacent_value_imputation(data: pd.DataFrame, adjancen
     return data
 
 
+def impute_and_save(data : pd.DataFrame, imputation_method, time_reference_col : str, numeric_columns : List, categorical_fill_values : pd.Series, file_path : str):
+    # Handle missing values with one method and save the cleaned dataset (main runs it in a worker process for each method)
+    # Parameter imputation_method is None for dropping rows, otherwise a NumericDatatypeImputationMethod or an AdjacentImputationMethod
+    match imputation_method:
+        case None:
+            data_cleaned = handle_missing_values_drop(data)
+        case NumericDatatypeImputationMethod():
+            data_cleaned = handle_missing_values_datatype_imputation(data, imputation_method, numeric_columns, categorical_fill_values)
+        case AdjacentImputationMethod():
+            data_cleaned = handle_missing_values_adjacent_value_imputation(data, imputation_method, time_reference_col, numeric_columns)
+    # Save the cleaned dataset (it is not saved if the cleaned dataset is empty)
+    save_data(data_cleaned, file_path)
+
+
+def run_variant(imputation_method, data_path : str, time_reference_col : str, numeric_columns : List, categorical_fill_values : pd.Series, file_path : str):
+    # Load the dataset which main saved once as parquet and run one method on it (main runs it in a worker process for each method)
+    # Reading the parquet file keeps the data types and is faster than unpickling the dataset which is sent to each task
+    impute_and_save(load_parquet(data_path), imputation_method, time_reference_col, numeric_columns, categorical_fill_values, file_path)
+
+
 def main():
     # Start logging
-    config_logging()
+    log_queue = config_logging()
 
     # Check the argument passed to the program
     # Note that the first argument is always the name of the program
@@ -173,42 +234,56 @@ def main():
     # If the dataset is not valid
     if original_data.empty:
         return
+    # Parquet files already keep the types of the columns, so only the text columns of csv files are converted to category
+    if not dataset_path.endswith(".parquet"):
+        original_data = convert_to_category(original_data)
     
     # Create a folder for cleaned datasets
     dataset_dir = path.dirname(dataset_path)
     output_dir = path.join(dataset_dir, "../", "output_handle_missing_values")
-    # Remove the directory if exists because some of the files may not need to create based on the program arguments
-    if path.exists(output_dir):
-        shutil.rmtree(output_dir)
-    # Create the folder
+    # Create the folder if it does not exist (the files of the previous runs are replaced or removed by save_data)
     makedirs(output_dir, exist_ok=True)
 
-    # Note that I copy the original data in to a dataset for each method to assure that it works on the original dataset for experimental purpose,
-    # but it is not advisable in the real-world scenarios, since it creates a big load especially for large datasets
-
-    # Handle missing values by dropping rows with missing values
-    data = original_data.copy()
-    data_cleaned_drop = handle_missing_values_drop(data)
-    # Save the cleaned dataset by dropping rows if the cleaned dataset is not empty
-    if not data_cleaned_drop.empty:
-        data_cleaned_drop.to_csv(path.join(output_dir, "dataset_cleaned_drop.csv"), index=False)
+    # The numeric columns are selected once, since all the methods work on the same original data
+    numeric_columns = get_numeric_columns(original_data)
+    # The modes of the categorical columns with missing values are also calculated once, since all the datatype imputation methods fill them the same way
+    categorical_fill_values = first_modes(original_data[[col for col in get_missing_columns(original_data) if col not in numeric_columns]])
 
-    # Handle missing values by using datatype imputation for numeric columns
+    # Each method works on the original dataset for experimental purpose, and the output file of each method is:
+    imputation_file_names = {None: "dataset_cleaned_drop.csv"}
     for numeric_datatype_imputation_method in list(NumericDatatypeImputationMethod):
-        data = original_data.copy()
-        data_cleaned_datatype_imputation = handle_missing_values_datatype_imputation(data, numeric_datatype_imputation_method)
-        # Save the cleaned dataset by replacing values if the cleaned dataset is not empty
-        if not data_cleaned_datatype_imputation.empty:
-            data_cleaned_datatype_imputation.to_csv(path.join(output_dir, "dataset_cleaned_datatype_imputation_" + f"{numeric_datatype_imputation_method.name}.csv"), index=False)
-
-    # Handle missing values using adjacent value imputation
+        imputation_file_names[numeric_datatype_imputation_method] = f"dataset_cleaned_datatype_imputation_{numeric_datatype_imputation_method.name}.csv"
     for adjacent_imputation_method in list(AdjacentImputationMethod):
-        data = original_data.copy()
-        data_cleaned_adjacent_value_imputation = handle_missing_values_adjacent_value_imputation(data, adjacent_imputation_method, time_reference_col)
-        # Save the cleaned dataset by replacing values if the cleaned dataset is not empty
-        if not data_cleaned_adjacent_value_imputation.empty:
-            data_cleaned_adjacent_value_imputation.to_csv(path.join(output_dir, "dataset_cleaned_adjacent_value_imputation_" + f"{adjacent_imputation_method.name}.csv"), index=False)
+        imputation_file_names[adjacent_imputation_method] = f"dataset_cleaned_adjacent_value_imputation_{adjacent_imputation_method.name}.csv"
+
+    # The methods are independent of each other and none of them changes the given dataset, so they can all work on the original data
+    # If HANDLE_MISSING_VALUES_SEQUENTIAL=1 is set, the methods run one after another in this process (e.g., for debugging or when memory is tight)
+    if environ.get("HANDLE_MISSING_VALUES_SEQUENTIAL") == "1":
+        # Copy-on-write is enabled like in the worker processes (see config_worker)
+        pd.set_option("mode.copy_on_write", True)
+        for imputation_method, file_name in imputation_file_names.items():
+            impute_and_save(original_data, imputation_method, time_reference_col, numeric_columns, categorical_fill_values, path.join(output_dir, file_name))
+        return
 
+    # Otherwise, each method runs in a separate process in parallel
+    # The dataset is saved once as a temporary parquet file which each process loads, instead of pickling the whole dataset into every task
+    # There is one process per method at most (like encode_categorical), since every process needs the whole dataset in its memory
+    with TemporaryDirectory() as temp_dir:
+        data_path = path.join(temp_dir, "original_data.parquet")
+        try:
+            original_data.to_parquet(data_path, index=False)
+        except (ImportError, ValueError, TypeError) as e:
+            # If pyarrow is not installed or it can not convert a column (e.g., mixed types in an object column), the dataset is sent to each task
+            logging.warning(f"The dataset can not be saved as parquet, so it is sent to each process! {e}")
+            data_path = None
+        with ProcessPoolExecutor(max_workers=min(len(imputation_file_names), multiprocessing.cpu_count()), initializer=config_worker, initargs=(log_queue,)) as executor:
+            futures = [executor.submit(run_variant, imputation_method, data_path, time_reference_col, numeric_columns, categorical_fill_values, path.join(output_dir, file_name))
+                       if data_path else
+                       executor.submit(impute_and_save, original_data, imputation_method, time_reference_col, numeric_columns, categorical_fill_values, path.join(output_dir, file_name))
+                       for imputation_method, file_name in imputation_file_names.items()]
+            # Wait for the methods in the order they finish, so an exception in a process is raised as soon as it happens
+            for future in as_completed(futures):
+                future.result()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
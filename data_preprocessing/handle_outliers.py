@@ -2,12 +2,17 @@ import pandas as pd
 import numpy as np
 from enum import Enum
 import sys
-from os import path, makedirs
+from os import path, makedirs, remove, replace, cpu_count
 from typing import List, Dict, Tuple
-import shutil
+from glob import glob
 import logging
+from common import config_logging, config_worker_logging, save_data, load_data
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future
 from sklearn.ensemble import IsolationForest
 from sklearn.neighbors import LocalOutlierFactor
+import matplotlib
+# The figures are only saved into files, so the non-interactive Agg backend is used (no GUI is needed)
+matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 import seaborn as sns
 
@@ -24,43 +29,16 @@ class HandleOutlierMethod(Enum):
     CAP_WITH_BOUNDARIES = 3
 
 
-def config_logging():
-    # This function configs logging and prepares it for logging process
-    # Note that logging creates logs from every operation has been done in the program which is the more flexible, durable, and powerful than only using print
-    # Whenever you want a new logging, just delete the existing one!
-    logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler("all_operations.log")
-    ]
-    )
-
-
-def load_data(file_path : str) -> pd.DataFrame:
-    # Open csv file and load it into a dataframe
-    try:
-        data = pd.read_csv(file_path)
-    except:
-        logging.error("The path is invalid!")
-        return pd.DataFrame()
-
-    # Return the first 5 rows of the dataset
-    logging.info(f"\n{data.head()}")
-
-    return data
-
-
 def get_observing_columns(data : pd.DataFrame, columns_subset : List) -> List:
     # Prepare observing columns
     # Strip whitespaces
     if columns_subset: columns_subset = [col.strip() for col in columns_subset]
     try:
         # If columns_subset only has numeric columns is valid
-        numeric_columns = data.select_dtypes(include="number").columns
+        numeric_columns = data.select_dtypes(include="number").columns.to_list()
         # If columns_subset is not None and one of its columns does not exist in numeric columns
-        if columns_subset and not all(col in numeric_columns for col in columns_subset):
+        # A set is used for checking, so each column is looked up once instead of scanning all numeric columns
+        if columns_subset and not set(columns_subset).issubset(numeric_columns):
             logging.error("The columns subset contains non-numeric columns!")
             return []
         else:
@@ -73,11 +51,18 @@ def get_observing_columns(data : pd.DataFrame, columns_subset : List) -> List:
     return observing_columns    
 
 
-def detect_outliers(data : pd.DataFrame, detect_outlier_method : DetectOutlierMethod, columns_subset : List = None, contamination_rate : float | str = "auto" , n_neighbors : int = 20, per_column_detection : bool = True) -> Tuple:
+def get_observing_values(data : pd.DataFrame, observing_columns : List) -> np.ndarray:
+    # Return the values of the observing columns as one float numpy array (rows x columns), missing values are NaN
+    # The numeric methods work on this array once, instead of getting each column from the dataframe
+    return data[observing_columns].to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def detect_outliers(data : pd.DataFrame, detect_outlier_method : DetectOutlierMethod, columns_subset : List = None, contamination_rate : float | str = "auto" , n_neighbors : int = 20, per_column_detection : bool = True, observing_values : np.ndarray = None) -> Tuple:
     # Parameter contamination_rate is used for training ISOLATION FOREST LOCAL OUTLIER FACTOR methods to set the boundries for outliers
     # Parameter n_neighbors is used for training OUTLIER FACTOR methods to set the number of observing neighbors
     # Parameter per_column_detection is used for training ISOLATION FOREST LOCAL OUTLIER FACTOR methods, as their main usage in analyzing multivariate data rather than univariates
     # but in case of comparison, I include both per-column and all-columns approaches for these methods
+    # Parameter observing_values (the values of the observing columns from get_observing_values) can be given if it is already known (e.g., main() prepares it once for IQR and ZSCORE), otherwise it is prepared here
 
     # Check if column_subset is valid
     observing_columns = get_observing_columns(data, columns_subset)
@@ -95,76 +80,104 @@ def detect_outliers(data : pd.DataFrame, detect_outlier_method : DetectOutlierMe
 
     outliers = {}
     boundries = {}
+    # The per-column models are trained in parallel threads (one model on one core per thread, at most one thread per core),
+    # and a single model on all the columns uses all the cores itself (n_jobs=-1), so the cores are never shared by two pools
+    max_column_workers = min(len(observing_columns), cpu_count() or 1)
     # Check detecting method and run the following block
     match detect_outlier_method:
         case DetectOutlierMethod.IQR:
-            for col in observing_columns:
-                # Calculate quantiles 1, 3
-                Q1 = data[col].quantile(0.25)
-                Q3 = data[col].quantile(0.75)
-                IQR = Q3 - Q1
-                # Extract outliers based on IQR method
-                outliers[col] = data.loc[(data[col] < Q1 - 1.5 * IQR) | (data[col] > Q3 + 1.5 * IQR)].index.to_list()
-                boundries[col] = (Q1 - 1.5 * IQR, Q3 + 1.5 * IQR)
+            # All the observing columns are processed at once on a numpy array (rows x columns), instead of column by column
+            if observing_values is None:
+                observing_values = get_observing_values(data, observing_columns)
+            # Calculate quantiles 1, 3 of all observing columns in one call (each column is partitioned once for both quantiles)
+            # Missing values are ignored like in pandas quantile
+            Q1, Q3 = np.nanpercentile(observing_values, [25, 75], axis=0)
+            IQR = Q3 - Q1
+            lower_boundries = Q1 - 1.5 * IQR
+            upper_boundries = Q3 + 1.5 * IQR
+            # Extract outliers based on IQR method
+            is_outlier = (observing_values < lower_boundries) | (observing_values > upper_boundries)
+            for col_number, col in enumerate(observing_columns):
+                outliers[col] = data.index[is_outlier[:, col_number]].to_numpy()
+                boundries[col] = (lower_boundries[col_number], upper_boundries[col_number])
 
         case DetectOutlierMethod.ZSCORE:
-            for col in observing_columns:
-                mean = data[col].mean()
-                std = data[col].std()
-                
-                # Extract outliers based on Z-Score method
-                # Z-Score = (data - mean)/std  -->  to be inlier  -->  -3 < Z-Score < 3
-                outliers[col] = data.loc[(data[col] < mean - 3 * std) | (data[col] > mean + 3 * std)].index.to_list()
-                boundries[col] = (mean - 3 * std, mean + 3 * std)
+            # All the observing columns are processed at once on a numpy array (rows x columns), instead of column by column
+            if observing_values is None:
+                observing_values = get_observing_values(data, observing_columns)
+            # Calculate mean and (sample) standard deviation of all observing columns, missing values are ignored like in pandas mean and std
+            # Columns with less than 2 values get NaN as their std (like pandas), so they have no outliers
+            is_valid = ~np.isnan(observing_values)
+            counts = is_valid.sum(axis=0)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                means = np.nansum(observing_values, axis=0) / counts
+                stds = np.sqrt(np.nansum((observing_values - means) ** 2, axis=0) / (counts - 1))
+            lower_boundries = means - 3 * stds
+            upper_boundries = means + 3 * stds
+            # Extract outliers based on Z-Score method
+            # Z-Score = (data - mean)/std  -->  to be inlier  -->  -3 < Z-Score < 3
+            is_outlier = (observing_values < lower_boundries) | (observing_values > upper_boundries)
+            for col_number, col in enumerate(observing_columns):
+                outliers[col] = data.index[is_outlier[:, col_number]].to_numpy()
+                boundries[col] = (lower_boundries[col_number], upper_boundries[col_number])
 
         case DetectOutlierMethod.ISOLATION_FOREST:
             if per_column_detection:
-                for col in observing_columns:
-                    # Create an object of the IsolationForest class, then train it and get the predictions based on the contamination_rate
-                    isolation_forest = IsolationForest(contamination=contamination_rate, random_state=42)
-                    # Be careful about the input formation. e.g., fit_predict accepts dataframe not a series. So, should give data[[col]] not data[col]
-                    predictions = isolation_forest.fit_predict(data[[col]])
+                # Create an object of the IsolationForest class for each column, then train it and get the predictions based on the contamination_rate
+                # Be careful about the input formation. e.g., fit_predict accepts dataframe not a series. So, should give data[[col]] not data[col]
+                # Columns are independent, so they are trained in parallel threads (scikit-learn releases the GIL while training)
+                # Threads are used instead of processes, since the dataset does not need to be copied to each of them
+                # Each model uses one core (n_jobs=1), since the threads already use all the cores (otherwise each thread starts a pool of all the cores)
+                with ThreadPoolExecutor(max_workers=max_column_workers) as executor:
+                    columns_predictions = list(executor.map(lambda col: IsolationForest(contamination=contamination_rate, random_state=42, n_jobs=1).fit_predict(data[[col]]), observing_columns))
+                for col, predictions in zip(observing_columns, columns_predictions):
                     # if the prediction == -1 means it is an outlier
-                    outliers[col] = data[predictions == -1].index.to_list()
+                    outliers[col] = data[predictions == -1].index.to_numpy()
                     # Isolation forest method, rather than IQR and Z-Score, does not have native boundries. So, we use the min and max value of inliers for that
-                    inliers = data.loc[~data.index.isin(outliers[col]), col]
+                    inliers = data.loc[predictions == 1, col]
                     boundries[col] = (inliers.min(), inliers.max())
             else:
-                # Create an object of the IsolationForest class, then train it and get the predictions based on the contamination_rate
-                isolation_forest = IsolationForest(contamination=contamination_rate, random_state=42)
+                # Create an object of the IsolationForest class, then train it and get the predictions based on the contamination_rate (n_jobs=-1 builds the trees on all CPU cores)
+                isolation_forest = IsolationForest(contamination=contamination_rate, random_state=42, n_jobs=-1)
                 # Train the model based on all columns under observation
                 predictions = isolation_forest.fit_predict(data[observing_columns])
                 # if the prediction == -1 means it is an outlier
-                outliers_indexes = data[predictions == -1].index.to_list()
+                outliers_indexes = data[predictions == -1].index.to_numpy()
+                # Isolation forest method, rather than IQR and Z-Score, does not have native boundries. So, we use the min and max value of inliers for that
+                # The inliers are selected by the predictions (no need to look up the outlier indexes), and the mask is the same for all columns
+                is_inlier = predictions == 1
                 for col in observing_columns:
                     outliers[col] = outliers_indexes
-                    # Isolation forest method, rather than IQR and Z-Score, does not have native boundries. So, we use the min and max value of inliers for that
-                    inliers = data.loc[~data.index.isin(outliers[col]), col]
+                    inliers = data.loc[is_inlier, col]
                     boundries[col] = (inliers.min(), inliers.max())
 
         case DetectOutlierMethod.LOCAL_OUTLIER_FACTOR:
             if per_column_detection:
-                for col in observing_columns:
-                    # Create an object of the LocalOutlierFactor class, then train it and get the predictions based on the contamination_rate and n_neighbors
-                    local_outlier_factor = LocalOutlierFactor(contamination=contamination_rate, n_neighbors=n_neighbors)
-                    # Be careful about the input formation. e.g., fit_predict accepts dataframe not a series. So, should give data[[col]] not data[col]
-                    predictions = local_outlier_factor.fit_predict(data[[col]])
+                # Create an object of the LocalOutlierFactor class for each column, then train it and get the predictions based on the contamination_rate and n_neighbors
+                # Be careful about the input formation. e.g., fit_predict accepts dataframe not a series. So, should give data[[col]] not data[col]
+                # Columns are independent, so they are trained in parallel threads (scikit-learn releases the GIL while searching the neighbors)
+                # Each model uses one core (n_jobs=1), since the threads already use all the cores
+                with ThreadPoolExecutor(max_workers=max_column_workers) as executor:
+                    columns_predictions = list(executor.map(lambda col: LocalOutlierFactor(contamination=contamination_rate, n_neighbors=n_neighbors, n_jobs=1).fit_predict(data[[col]]), observing_columns))
+                for col, predictions in zip(observing_columns, columns_predictions):
                     # if the prediction == -1 means it is an outlier
-                    outliers[col] = data[predictions == -1].index.to_list()
+                    outliers[col] = data[predictions == -1].index.to_numpy()
                     # Local outlier factor method, rather than IQR and Z-Score, does not have native boundries. So, we use the min and max value of inliers for that
-                    inliers = data.loc[~data.index.isin(outliers[col]), col]
+                    inliers = data.loc[predictions == 1, col]
                     boundries[col] = (inliers.min(), inliers.max())
             else:
-                # Create an object of the LocalOutlierFactor class, then train it and get the predictions based on the contamination_rate and n_neighbors
-                local_outlier_factor = LocalOutlierFactor(contamination=contamination_rate, n_neighbors=n_neighbors)
+                # Create an object of the LocalOutlierFactor class, then train it and get the predictions based on the contamination_rate and n_neighbors (n_jobs=-1 searches the neighbors on all CPU cores)
+                local_outlier_factor = LocalOutlierFactor(contamination=contamination_rate, n_neighbors=n_neighbors, n_jobs=-1)
                 # Train the model based on all columns under observation
                 predictions = local_outlier_factor.fit_predict(data[observing_columns])
                 # if the prediction == -1 means it is an outlier
-                outliers_indexes = data[predictions == -1].index.to_list()
+                outliers_indexes = data[predictions == -1].index.to_numpy()
+                # Local outlier factor method, rather than IQR and Z-Score, does not have native boundries. So, we use the min and max value of inliers for that
+                # The inliers are selected by the predictions (no need to look up the outlier indexes), and the mask is the same for all columns
+                is_inlier = predictions == 1
                 for col in observing_columns:
                     outliers[col] = outliers_indexes
-                    # Local outlier factor method, rather than IQR and Z-Score, does not have native boundries. So, we use the min and max value of inliers for that
-                    inliers = data.loc[~data.index.isin(outliers[col]), col]
+                    inliers = data.loc[is_inlier, col]
                     boundries[col] = (inliers.min(), inliers.max())
 
     # Output of the function is a Tuple consists of oulier indexes dict and boundries on inliers dict
@@ -175,30 +188,42 @@ def handle_outliers(data : pd.DataFrame, handle_outlier_method : HandleOutlierMe
     # If the outlier dict is empty, the output is the original data
     if len(outliers) == 0: return data
 
-    # First unpack the values of the outlier dict and then union all of them in a set (to eliminate duplicate indexes)
-    all_drop_indexes = set().union(*outliers.values())
+    # The given dataset is not changed, the methods below only replace the columns of this shallow copy (the other columns are not copied)
+    data = data.copy(deep=False)
+
+    # First unpack the values of the outlier dict (arrays of indexes) and then concatenate them and mark the rows containing outliers in a boolean mask
+    # It is done by numpy on arrays (duplicate indexes are marked once), instead of adding the indexes one by one to a python set
+    is_outlier_row = data.index.isin(np.concatenate(list(outliers.values())))
     
     # Check dataset to know how many duplicate values exist
     # Find duplicate values
-    logging.info(f"Dataset has {data.shape[0]} rows before handling outliers values.\nTop 10 of rows containing outliers are (Totally {len(all_drop_indexes)} rows):\n{data.iloc[list(all_drop_indexes)].head(10)}")
+    # Selecting the rows containing outliers copies them (only the first 10 are selected), so it is done only if the log is written (e.g., not when the logging level is WARNING)
+    if logging.getLogger().isEnabledFor(logging.INFO):
+        logging.info(f"Dataset has {data.shape[0]} rows before handling outliers values.\nTop 10 of rows containing outliers are (Totally {is_outlier_row.sum()} rows):\n{data.iloc[np.flatnonzero(is_outlier_row)[:10]]}")
 
     match handle_outlier_method:
         case HandleOutlierMethod.DROP:
             # Drop all outliers
-            data = data.drop(all_drop_indexes)
+            # The rows are kept by the boolean mask, instead of drop() which looks up the labels of all the remaining rows again
+            data = data.iloc[~is_outlier_row]
         case HandleOutlierMethod.REPLACE_WITH_MEDIAN:
+            # The medians of all the columns which have outliers are calculated together before replacing any value
+            medians = data[list(outliers.keys())].median()
             for col in outliers.keys():
                 # For each column which has outliers, all the outliers replace with Median of that column
-                data.loc[outliers[col], col] = data[col].median()
+                # The column is replaced by a new one (instead of changing its values in place), so the given dataset is not changed
+                data[col] = data[col].mask(data.index.isin(outliers[col]), medians[col])
         case HandleOutlierMethod.CAP_WITH_BOUNDARIES:
-            for col in outliers.keys():
-                # For each column which has outliers, all the outliers cap (clip) with boundry values of that column
-                lower, upper = boundries[col]
-                # If the boundries are float, the column type should be converted to float (implicit casting is deprecated)
-                # "isinstance" is safer than "type", since it also include numpy types
-                if isinstance(lower, float) or isinstance(upper, float):
-                    data[col] = data[col].astype(float)
-                data.loc[outliers[col], col] = data.loc[outliers[col], col].clip(lower, upper)
+            # All the columns which have outliers are capped (clipped) with boundry values of each column in one call
+            # Note that only the outliers are out of the boundries, so clipping the whole columns only changes the outliers
+            observing_columns = list(outliers.keys())
+            # If the boundries are float, the column type should be converted to float (implicit casting is deprecated)
+            # "isinstance" is safer than "type", since it also include numpy types
+            float_columns = [col for col in observing_columns if isinstance(boundries[col][0], float) or isinstance(boundries[col][1], float)]
+            data[float_columns] = data[float_columns].astype(float)
+            lower_boundries = pd.Series({col: boundries[col][0] for col in observing_columns})
+            upper_boundries = pd.Series({col: boundries[col][1] for col in observing_columns})
+            data[observing_columns] = data[observing_columns].clip(lower_boundries, upper_boundries, axis=1)
 
     # Check dataset rows after removing duplicate rows
     logging.info(f"Dataset has {data.shape[0]} rows after handling outliers.")
@@ -206,45 +231,67 @@ def handle_outliers(data : pd.DataFrame, handle_outlier_method : HandleOutlierMe
     return data
 
 
-def visualize_outliers(original_data : pd.DataFrame, cleaned_data : pd.DataFrame, output_dir : str, detect_outlier_method : DetectOutlierMethod, handle_outlier_method : HandleOutlierMethod, columns_subset : List = None):
+def visualize_column(original_values : pd.Series, cleaned_values : pd.Series, file_name : str) -> str:
+    # Plot the boxplot and histogram of a column before and after handling outliers and save it (visualize_outliers runs it in a worker process for each column)
+    # Set the resolution and quality
+    # 150 dpi gives a 2400x1350 image, which is clear enough for the plots and is much faster to render and compress than 600 dpi (16 times fewer pixels)
+    fig = plt.figure(figsize=(16, 9), dpi=150)
+    # Setup the layout to fit in the figure
+    plt.tight_layout(pad=1, h_pad=0.5, w_pad=0.5)   
+
+    plt.subplot(2,2,1)
+    sns.boxplot(original_values)
+
+    plt.subplot(2,2,2)
+    sns.histplot(original_values, kde=True)
+
+    plt.subplot(2,2,3)
+    sns.boxplot(cleaned_values)
+
+    plt.subplot(2,2,4)
+    sns.histplot(cleaned_values, kde=True)
+
+    # Save the file with proper dpi
+    # The figure is saved into a temporary file first and then renamed, so the figure of the previous run is never half overwritten
+    plt.savefig(fname=file_name + ".tmp", format="png", dpi=fig.dpi)
+    replace(file_name + ".tmp", file_name)
+
+    plt.close(fig)
+
+    return file_name
+
+
+def visualize_outliers(original_data : pd.DataFrame, cleaned_data : pd.DataFrame, output_dir : str, detect_outlier_method : DetectOutlierMethod, handle_outlier_method : HandleOutlierMethod, columns_subset : List = None, executor : ProcessPoolExecutor = None) -> List[Future]:
+    # Parameter executor is a process pool which can be shared by several calls (e.g., main() renders all the methods in one pool)
+    # In this case the figures are only submitted and their futures are returned, otherwise a pool is created here and the figures are waited for
+    if executor is None:
+        with ProcessPoolExecutor() as executor:
+            # Wait for all the figures (an exception in a process is raised here)
+            for future in visualize_outliers(original_data, cleaned_data, output_dir, detect_outlier_method, handle_outlier_method, columns_subset, executor):
+                future.result()
+        return []
+
     # Check if column_subset is valid
     observing_columns = get_observing_columns(original_data, columns_subset)
-    if len(observing_columns) == 0: return
+    if len(observing_columns) == 0: return []
 
     # Make the visualization directory path
     visualization_dir = path.join(output_dir, "visualizations")
     # Create the folder
     makedirs(visualization_dir, exist_ok=True)
 
-    # Set the resolution and quality
-    fig = plt.figure(figsize=(16, 9), dpi=600)
-    # Setup the layout to fit in the figure
-    plt.tight_layout(pad=1, h_pad=0.5, w_pad=0.5)   
-    
-    for col in observing_columns:
-        plt.subplot(2,2,1)
-        sns.boxplot(original_data[col])
-
-        plt.subplot(2,2,2)
-        sns.histplot(original_data[col], kde=True)
+    # Each column has its own figure which is independent of the others, so the figures are rendered in separate processes in parallel
+    # (rendering and compressing the images is CPU-bound and holds the GIL, so threads would not help)
+    return [executor.submit(visualize_column, original_data[col], cleaned_data[col], path.join(visualization_dir, "_".join([detect_outlier_method.name, handle_outlier_method.name, col]) + ".png"))
+            for col in observing_columns]
 
-        plt.subplot(2,2,3)
-        sns.boxplot(cleaned_data[col])
 
-        plt.subplot(2,2,4)
-        sns.histplot(cleaned_data[col], kde=True)
-
-        # Save the file with proper dpi
-        file_name = path.join(visualization_dir, "_".join([detect_outlier_method.name, handle_outlier_method.name, col]) + ".png")
-        plt.savefig(fname=file_name, format="png", dpi=fig.dpi)
-
-        plt.clf()
-        
-    plt.close()
-    
 def main():
     # Start logging
-    config_logging()
+    log_queue = config_logging()
+
+    # Enable copy-on-write, so the shallow copies in handle_outliers share the memory of the original data and only the columns which are changed get copied
+    pd.set_option("mode.copy_on_write", True)
 
     # Check the argument passed to the program
     # Note that the first argument is always the name of the program
@@ -273,36 +320,53 @@ def main():
     # Create a folder for cleaned datasets
     dataset_dir = path.dirname(dataset_path)
     output_dir = path.join(dataset_dir, "../", "output_handle_outliers")
-    # Remove the directory if exists because some of the files may not need to create based on the program arguments
-    if path.exists(output_dir):
-        shutil.rmtree(output_dir)
-    # Create the folder
+    # Create the folder if it does not exist (the files of the previous runs are replaced or removed by save_data)
     makedirs(output_dir, exist_ok=True)
 
     # -------------------------------
     # Detect outliers by all methods including IQR, ZSCORE, ISOLATION_FOREST, LOCAL_OUTLIER_FACTOR
     # -------------------------------
 
+    # The observing columns are prepared once and given as the columns subset of all the methods below, since they are the same for all of them
+    columns_subset = get_observing_columns(original_data, columns_subset)
+    if len(columns_subset) == 0: return
+
+    # The values of the observing columns are converted to a numpy array once for all the methods which use it (IQR and ZSCORE)
+    observing_values = get_observing_values(original_data, columns_subset)
+
     outliers = dict()
     cap_boundries = dict()
 
     # Detect outliers
     for detect_outlier_method in list(DetectOutlierMethod):
-        outliers[detect_outlier_method], cap_boundries[detect_outlier_method] = detect_outliers(original_data, detect_outlier_method, columns_subset,"auto",20,False)
+        outliers[detect_outlier_method], cap_boundries[detect_outlier_method] = detect_outliers(original_data, detect_outlier_method, columns_subset,"auto",20,False, observing_values)
 
     # -------------------------------
     # Handle outliers by DROP, REPLACE_WITH_MEDIAN, CAP_WITH_BOUNDARIES methods based on outliers detected via IQR, ZSCORE, ISOLATION_FOREST, LOCAL_OUTLIER_FACTOR methods + Visualizations
     # -------------------------------
 
-    # Drop outliers
-    for detect_outlier_method in list(DetectOutlierMethod):
-        for handle_outlier_method in list(HandleOutlierMethod):
-            data = original_data.copy()
-            data_cleaned = handle_outliers(data, handle_outlier_method, outliers[detect_outlier_method], cap_boundries[detect_outlier_method])        
-            # Save the cleaned dataset is not empty
-            if not data_cleaned.empty:
-                data_cleaned.to_csv(path.join(output_dir, "_".join(["dataset_cleaned", detect_outlier_method.name, handle_outlier_method.name]) + ".csv"), index=False)
-            visualize_outliers(original_data, data_cleaned, output_dir, detect_outlier_method, handle_outlier_method, columns_subset)
+    # The figures of all the methods are rendered in one process pool, which is started once and works while the next methods are handled
+    # The workers put their log records in the multiprocessing queue of the main process (like encode_categorical), since the logging
+    # handlers which are copied into a forked process do not reach the listener thread of the main process
+    with ProcessPoolExecutor(initializer=config_worker_logging, initargs=(log_queue,)) as executor:
+        visualization_futures = []
+        # Drop outliers
+        for detect_outlier_method in list(DetectOutlierMethod):
+            for handle_outlier_method in list(HandleOutlierMethod):
+                # handle_outliers does not change the original data, so there is no need to copy it
+                data_cleaned = handle_outliers(original_data, handle_outlier_method, outliers[detect_outlier_method], cap_boundries[detect_outlier_method])        
+                # Save the cleaned dataset (it is not saved if the cleaned dataset is empty)
+                save_data(data_cleaned, path.join(output_dir, "_".join(["dataset_cleaned", detect_outlier_method.name, handle_outlier_method.name]) + ".csv"))
+                visualization_futures.extend(visualize_outliers(original_data, data_cleaned, output_dir, detect_outlier_method, handle_outlier_method, columns_subset, executor))
+        # Wait for all the figures (an exception in a process is raised here)
+        for future in visualization_futures:
+            future.result()
+
+    # Remove the figures of the previous runs which are not rendered again (e.g., the columns which are not in the columns subset anymore)
+    rendered_figures = {future.result() for future in visualization_futures}
+    for figure in glob(path.join(output_dir, "visualizations", "*.png")):
+        if figure not in rendered_figures:
+            remove(figure)
 
 
 if __name__ == "__main__":
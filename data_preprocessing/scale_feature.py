@@ -1,8 +1,8 @@
 import pandas as pd
 import sys
 from os import path, makedirs
-import shutil
 import logging
+from common import config_logging, save_data, load_data
 from typing import Dict, List
 from sklearn.preprocessing import MinMaxScaler, StandardScaler, RobustScaler, Normalizer
 from enum import Enum
@@ -14,43 +14,18 @@ class ScalingMethod(Enum):
     ROBUST_SCALING = 3
 
 
-def config_logging():
-    # This function configs logging and prepares it for logging process
-    # Note that logging creates logs from every operation has been done in the program which is the more flexible, durable, and powerful than only using print
-    # Whenever you want a new logging, just delete the existing one!
-    logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler("all_operations.log")
-    ]
-    )
-
-
-def load_data(file_path : str) -> pd.DataFrame:
-    # Open csv file and load it into a dataframe
-    try:
-        data = pd.read_csv(file_path)
-    except:
-        logging.error("The path is invalid!")
-        return pd.DataFrame()
-
-    # Return the first 5 rows of the dataset
-    logging.info(f"\n{data.head()}")
-
-    return data
-
-
-def get_observing_columns(data : pd.DataFrame, columns_subset : List) -> List:
+def get_observing_columns(data : pd.DataFrame, columns_subset : List, numeric_columns : List = None) -> List:
+    # Parameter numeric_columns can be given if it is already known (e.g., scale_feature() selects it once for validation and l2 normalization), otherwise it is selected here
     # Prepare observing columns
     # Strip whitespaces
     if columns_subset: columns_subset = [col.strip() for col in columns_subset]
     try:
         # If columns_subset only has numeric columns is valid
-        numeric_columns = data.select_dtypes(include="number").columns
+        if numeric_columns is None:
+            numeric_columns = data.select_dtypes(include="number").columns
         # If columns_subset is not None and one of its columns does not exist in numeric columns
-        if columns_subset and not all(col in numeric_columns for col in columns_subset):
+        # A set is used for checking, so each column is looked up once instead of scanning all numeric columns
+        if columns_subset and not set(columns_subset).issubset(numeric_columns):
             logging.error("The columns subset contains non-numeric columns!")
             return []
         else:
@@ -72,48 +47,54 @@ def scale_feature(data : pd.DataFrame, scale_scenario : Dict, apply_l2normalizat
         logging.error("Number of columns and scaling methods do not match!")
         return data
 
+    # The numeric columns are selected once, since both the validation and l2 normalization need them
+    # Note that scaling does not change which columns are numeric
+    numeric_columns = data.select_dtypes(include="number").columns.to_list()
+
     # Check if column_subset is valid
-    observing_columns = get_observing_columns(data, scale_scenario["column"])
+    observing_columns = get_observing_columns(data, scale_scenario["column"], numeric_columns)
     if len(observing_columns) == 0: return data
 
     scale_scenario["scaling_method"] = [sm.strip() for sm in scale_scenario["scaling_method"]]
     # Check all the provided scaling_method to be valid
-    if not all(sm in [c.name for c in list(ScalingMethod)] for sm in scale_scenario["scaling_method"]):
+    # The names of the scaling methods are put in a set once, instead of making the list of names again for each scaling method
+    if not set(scale_scenario["scaling_method"]).issubset({c.name for c in list(ScalingMethod)}):
         logging.error("At least one of the scaling methods provided in the scenario is not valid! The only acceptable data types are: {MINMAX_SCALING, ZSCORE_STANDARDIZATION, ROBUST_SCALING}")
         return data
 
     # Create a list of tuples (column, scaling_method)
     scale_scenario_zipped = list(zip(observing_columns,scale_scenario["scaling_method"]))
 
-    # For each column in the list, we apply the proper scaling method
-    # Then update the date[column]
-    for column, scaling_method in scale_scenario_zipped:
+    # For each scaling method, we apply it on all of its columns together in one call
+    # The scalers fit each column separately, so it is the same as scaling column by column, but the data is converted and validated once per method
+    # If a column is repeated in the scenario, its scalings depend on each other, so every (column, scaling_method) is applied one by one in the scenario order
+    if len(set(observing_columns)) == len(observing_columns):
+        scaling_steps = [([column for column, column_scaling_method in scale_scenario_zipped if column_scaling_method == scaling_method.name], scaling_method)
+                         for scaling_method in list(ScalingMethod)]
+    else:
+        scaling_steps = [([column], ScalingMethod[column_scaling_method]) for column, column_scaling_method in scale_scenario_zipped]
+    # Then update the date[columns]
+    for columns, scaling_method in scaling_steps:
+        if len(columns) == 0: continue
         match scaling_method:
-            case ScalingMethod.MINMAX_SCALING.name:
-                minmax_scaler = MinMaxScaler()
-                data[column] = minmax_scaler.fit_transform(data[[column]])
-            case ScalingMethod.ZSCORE_STANDARDIZATION.name:
-                zscore_standardization = StandardScaler()
-                data[column] = zscore_standardization.fit_transform(data[[column]])
-            case ScalingMethod.ROBUST_SCALING.name:
-                robust_scaler = RobustScaler()
-                data[column] = robust_scaler.fit_transform(data[[column]])
+            case ScalingMethod.MINMAX_SCALING:
+                scaler = MinMaxScaler()
+            case ScalingMethod.ZSCORE_STANDARDIZATION:
+                scaler = StandardScaler()
+            case ScalingMethod.ROBUST_SCALING:
+                scaler = RobustScaler()
+        data[columns] = scaler.fit_transform(data[columns])
 
     # If apply_l2normalization then we apply l2 normalization on all numeric columns of the dataset
     # Since this type of normalization only makes sense if it applies on all numeric columns
     if apply_l2normalization:
         l2_normalizer = Normalizer()
-        # Extract all numeric columns
-        numeric_columns = data.select_dtypes("number")
-        data_transformed = l2_normalizer.fit_transform(numeric_columns)
-        col_number = 0
-        for col in numeric_columns.columns: 
-            # Update dataset based on all numeric columns which are normalized
-            data[col] = data_transformed[:,col_number]
-            col_number += 1 
+        # Update dataset based on all numeric columns which are normalized (all of them are assigned in one call)
+        data[numeric_columns] = l2_normalizer.fit_transform(data[numeric_columns])
 
     return data
 
+
 def main():
     # Start logging
     config_logging()
@@ -148,18 +129,14 @@ def main():
     # Create a folder for cleaned datasets
     dataset_dir = path.dirname(dataset_path)
     output_dir = path.join(dataset_dir, "../", "output_scale_feature")
-    # Remove the directory if exists because some of the files may not need to create based on the program arguments
-    if path.exists(output_dir):
-        shutil.rmtree(output_dir)
-    # Create the folder
+    # Create the folder if it does not exist (the files of the previous runs are replaced or removed by save_data)
     makedirs(output_dir, exist_ok=True)
 
     # Scale and normalize the dataset
-    data = original_data.copy()
-    data_scaled = scale_feature(data, {"column":columns_subset, "scaling_method":columns_scaling_method}, apply_l2normalization)
-    # Save the converted dataset if the it is not empty
-    if not data_scaled.empty:
-        data_scaled.to_csv(path.join(output_dir, "dataset_scaled.csv"), index=False)
+    # The original data is not used after scaling, so it is scaled directly without copying the whole dataset
+    data_scaled = scale_feature(original_data, {"column":columns_subset, "scaling_method":columns_scaling_method}, apply_l2normalization)
+    # Save the scaled dataset (it is not saved if the scaled dataset is empty)
+    save_data(data_scaled, path.join(output_dir, "dataset_scaled.csv"))
     
 
 if __name__ == "__main__":
@@ -0,0 +1,22 @@
+import sys
+from pathlib import Path
+import pytest
+import pandas as pd
+
+# Add the parent directory to sys.path once for all test modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# The sample dataframes are built once per test module (sample_df2 once per session)
+# Tests which pass them to a function that changes the given dataset (e.g., scale_feature or label encoding) must pass a copy
+
+
+@pytest.fixture(scope="session")
+def sample_df2():
+    # This will create a DataFrame for testing purposes
+    # It is shared by the whole session, since the imputation methods do not change the given dataset
+    data = {
+        "A": [1, 2, None, 4],
+        "B": [None, 2, 3, 4],
+        "C": ["a", "a", "c", None]
+    }
+    return pd.DataFrame(data)
@@ -1,12 +1,7 @@
 import pytest
 import pandas as pd
-import os
-import sys
 
-# Add the parent directory to sys.path
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-
-from convert_datatype import convert_datatype_auto, convert_datatype_ud
+from convert_datatype import convert_datatype_auto, convert_datatype_ud, convert_datatype_learned, convert_datatype_chunks
 
 
 def test_convert_datatype_auto():
@@ -17,12 +12,56 @@ def test_convert_datatype_auto():
         "Test Date": ["2024-04-10", "2024-04-12"]
     })
     converted_df = convert_datatype_auto(df)
-    print(converted_df["Age"].dtype)
     assert pd.api.types.is_integer_dtype(converted_df["Age"]) or pd.api.types.is_float_dtype(converted_df["Age"])
     assert pd.api.types.is_float_dtype(converted_df["Score"])
     assert pd.api.types.is_datetime64_any_dtype(converted_df["Test Date"])
 
 
+def test_convert_datatype_learned():
+    first_chunk = convert_datatype_auto(pd.DataFrame({
+        "Age": ["25", "30"],
+        "Test Date": ["2024-04-10", "2024-04-12"]
+    }))
+    next_chunk = pd.DataFrame({
+        "Age": ["41", "52"],
+        "Test Date": ["2024-05-01", "2024-05-02"]
+    })
+    converted_df = convert_datatype_learned(next_chunk, first_chunk.dtypes.to_dict())
+    assert converted_df.dtypes.equals(first_chunk.dtypes)
+
+
+def test_convert_datatype_learned_invalid_values():
+    # A text in a numeric column does not fit the learned types, so it becomes a missing value and the column keeps the learned int type
+    df = pd.DataFrame({
+        "Age": ["41", "unknown", "52.5"],
+        "Score": ["1.5", "2", "none"]
+    })
+    converted_df = convert_datatype_learned(df, {"Age": "int64", "Score": "float64"})
+    assert converted_df["Age"].dtype == "Int64"
+    assert converted_df["Age"].isna().to_list() == [False, True, True]
+    assert converted_df["Score"].dtype == "float64"
+    assert converted_df["Score"].isna().to_list() == [False, False, True]
+
+
+def test_convert_datatype_chunks(tmp_path):
+    # Chunks of 2 rows: "Age" is int in the first chunk, has a missing value in the second and a text in the third
+    df = pd.DataFrame({
+        "Age": ["25", "30", "", "41", "unknown", "60"],
+        "Score": ["1", "2", "3", "4", "5.5", "6"]
+    })
+    df.to_csv(tmp_path / "dataset.csv", index=False)
+    scenario = {"column": ["Age"], "datatype": ["int"], "format": [""]}
+    convert_datatype_chunks(str(tmp_path / "dataset.csv"), str(tmp_path / "auto"), str(tmp_path / "ud"), scenario, chunksize=2)
+    parts = [pd.read_parquet(part) for part in sorted((tmp_path / "auto").glob("*.parquet"))]
+    assert len(parts) == 3
+    # All the parts get the types of the whole dataset
+    for part in parts:
+        assert part["Age"].dtype == "object"
+        assert pd.api.types.is_float_dtype(part["Score"])
+    # The user-defined conversion fails for the whole dataset, so it is not saved
+    assert not (tmp_path / "ud").exists()
+
+
 def test_convert_datatype_ud_success():
     df = pd.DataFrame({
         "High School Percentage": ["80", "90"],
@@ -38,6 +77,21 @@ def test_convert_datatype_ud_success():
     assert pd.api.types.is_datetime64_any_dtype(converted_df["Test Date"])
 
 
+def test_convert_datatype_ud_keeps_scenario():
+    df = pd.DataFrame({
+        "col1": ["80", "90"]
+    })
+    scenario = {
+        "column": [" col1 "],
+        "datatype": ["int"],
+        "format": [""]
+    }
+    converted_df = convert_datatype_ud(df, scenario)
+    assert pd.api.types.is_integer_dtype(converted_df["col1"])
+    # The caller's scenario must not be stripped in place
+    assert scenario["column"] == [" col1 "]
+
+
 def test_convert_datatype_ud_fail_column():
     df = pd.DataFrame({
         "Some Column": ["80", "90"]
@@ -76,3 +130,31 @@ def test_convert_datatype_ud_fail_defected_scenario():
     }
     result_df = convert_datatype_ud(df, scenario)
     assert result_df.equals(df)
+
+
+def test_convert_datatype_ud_fail_conversion():
+    df = pd.DataFrame({
+        "col1": ["80", "abc"]
+    })
+    scenario = {
+        "column": ["col1"],
+        "datatype": ["int"],
+        "format": [""]
+    }
+    result_df = convert_datatype_ud(df, scenario)
+    # The column is not converted, since "abc" is not numeric
+    assert result_df["col1"].dtype == "object"
+
+def test_convert_datatype_ud_fail_conversion_fraction():
+    df = pd.DataFrame({
+        "col1": ["80", "85.5"]
+    })
+    scenario = {
+        "column": ["col1"],
+        "datatype": ["int"],
+        "format": [""]
+    }
+    result_df = convert_datatype_ud(df, scenario)
+    # The column is not converted, since "85.5" would be truncated to 85
+    assert result_df["col1"].dtype == "object"
+    assert result_df["col1"].to_list() == ["80", "85.5"]
@@ -1,15 +1,10 @@
 import pandas as pd
 import pytest
-import os
-import sys
-
-# Add the parent directory to sys.path
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from encode_categorical import get_observing_columns, encode_categorical, CategoricalEncodingMethod
 
 # Sample DataFrame for testing
-@pytest.fixture
+@pytest.fixture(scope="module")
 def sample_data():
     return pd.DataFrame({
     "Color": ["Red", "Blue", "Green", "Red", "Blue"],
@@ -54,6 +49,13 @@ def test_label_encoding_all_columns(sample_data):
     assert "Color_encoded" in encoded_df.columns
     assert "Shape_encoded" in encoded_df.columns
 
+def test_label_encoding_missing_values():
+    df = pd.DataFrame({"Color": ["Red", None, "Blue", "Red"]})
+    encoded_df = encode_categorical(df, CategoricalEncodingMethod.LABEL_ENCODING)
+    # Missing values stay missing instead of getting a label, and the other values get the sorted labels
+    assert encoded_df["Color_encoded"].isna().to_list() == [False, True, False, False]
+    assert encoded_df["Color_encoded"].dropna().to_list() == [1, 0, 1]
+
 def test_onehot_encoding_single_column(sample_data):
     df = sample_data.copy()
     encoded_df = encode_categorical(df, CategoricalEncodingMethod.ONEHOT_ENCODING, ["Color"])
@@ -1,14 +1,9 @@
 import pytest
 import pandas as pd
-import sys
-import os
 
-# Add the parent directory to sys.path
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from handle_duplicate_values import handle_duplicate_values_exact, handle_duplicate_values_exact_chunks, handle_duplicate_values_fuzzy
 
-from handle_duplicate_values import handle_duplicate_values_exact, handle_duplicate_values_fuzzy
-
-@pytest.fixture
+@pytest.fixture(scope="module")
 def sample_data():
     return pd.DataFrame({
         'First Name': ['Alice', 'Alice', 'Bob', 'Charlie', 'Charlie', 'Charlie'],
@@ -16,7 +11,7 @@ def sample_data():
         'Age': [30, 30, 25, 40, 35, 40]
     })
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def fuzzy_data():
     return pd.DataFrame({
         'Name': ['Alice Smith', 'Alic Smith', 'Bob Jones', 'Charlie Brown', 'Charli Browne'],
@@ -44,7 +39,36 @@ def test_exact_duplicates_empty_df():
     empty_df = pd.DataFrame(columns=['A', 'B'])
     cleaned_df = handle_duplicate_values_exact(empty_df)
     # Check for not getting error in this case
-    assert cleaned_df.empty 
+    assert cleaned_df.empty
+
+def test_exact_duplicates_mixed_types():
+    df = pd.DataFrame({'A': [1, '1', 2.0, '2.0'], 'B': ['x', 'x', 'y', 'y']})
+    cleaned_df = handle_duplicate_values_exact(df)
+    # Values of different types are not duplicates (like drop_duplicates())
+    assert len(cleaned_df) == len(df.drop_duplicates())
+
+def test_exact_duplicates_chunks(sample_data, tmp_path):
+    input_path = tmp_path / "dataset.csv"
+    output_path = tmp_path / "dataset_cleaned.csv"
+    sample_data.to_csv(input_path, index=False)
+    # Chunks of 2 rows, so the duplicates are in different chunks
+    remained_rows_count = handle_duplicate_values_exact_chunks(str(input_path), str(output_path), subset=['First Name', 'Last Name'], chunksize=2)
+    assert remained_rows_count == 4
+    cleaned_df = pd.read_csv(output_path)
+    assert cleaned_df.equals(handle_duplicate_values_exact(sample_data, subset=['First Name', 'Last Name']).reset_index(drop=True))
+
+def test_exact_duplicates_chunks_invalid_subset(sample_data, tmp_path):
+    input_path = tmp_path / "dataset.csv"
+    output_path = tmp_path / "dataset_cleaned.csv"
+    sample_data.to_csv(input_path, index=False)
+    output_path.write_text("previous run")
+    assert handle_duplicate_values_exact_chunks(str(input_path), str(output_path), subset=['Country'], chunksize=2) == 0
+    # The output of the previous run is not touched and no temporary file remains
+    assert output_path.read_text() == "previous run"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["dataset.csv", "dataset_cleaned.csv"]
+
+def test_exact_duplicates_chunks_invalid_path(tmp_path):
+    assert handle_duplicate_values_exact_chunks(str(tmp_path / "not_exist.csv"), str(tmp_path / "out.csv")) == 0
 
 # -------------------------------
 # Test handle_duplicate_values_fuzzy
@@ -70,6 +94,42 @@ def test_fuzzy_no_matches_with_high_threshold(fuzzy_data):
     # With 100% threshold, behaves like exact match with no real duplicates
     assert cleaned_df.equals(fuzzy_data)  
 
+def test_fuzzy_duplicates_transitive_groups():
+    # Each neighbour in the chain differs in one character (ratio 90), so all four rows form one group,
+    # although the pairs are found in the order (0,2), (1,3), (2,3)
+    chain_df = pd.DataFrame({
+        'Code': ['abcdefghij', 'abcdexyzij', 'abcdexghij', 'abcdexyhij']
+    })
+    cleaned_df = handle_duplicate_values_fuzzy(chain_df, ratio_range=(90, 100))
+    assert len(cleaned_df) == 1
+
+def test_fuzzy_duplicates_word_order():
+    reordered_df = pd.DataFrame({
+        'Name': ['Alice Smith', 'smith, alice', 'Bob Jones']
+    })
+    cleaned_df = handle_duplicate_values_fuzzy(reordered_df, ratio_range=(100, 100))
+    # Case, punctuation and order of words are ignored
+    assert cleaned_df['Name'].to_list() == ['Alice Smith', 'Bob Jones']
+
+def test_fuzzy_duplicates_blocking_column(fuzzy_data):
+    cleaned_df = handle_duplicate_values_fuzzy(fuzzy_data, blocking_column='City')
+    # Same results as comparing all rows, since the similar rows are in the same city
+    assert cleaned_df.equals(handle_duplicate_values_fuzzy(fuzzy_data))
+    assert len(cleaned_df) < len(fuzzy_data)
+
+def test_fuzzy_duplicates_invalid_blocking_column(fuzzy_data):
+    cleaned_df = handle_duplicate_values_fuzzy(fuzzy_data, blocking_column='Country')
+    assert cleaned_df.empty
+
+def test_fuzzy_duplicates_exact_punctuation_values():
+    punctuation_df = pd.DataFrame({
+        'Name': ['Alice Smith', 'Alice Smith', 'Bob Jones'],
+        'Company': ['-', '-', 'ACME']
+    })
+    cleaned_df = handle_duplicate_values_fuzzy(punctuation_df, ratio_range=(100, 100))
+    # Exactly equal values are always duplicates, even if they are empty after removing punctuation
+    assert len(cleaned_df) == 2
+
 def test_fuzzy_duplicates_empty_df():
     empty_df = pd.DataFrame(columns=['A', 'B'])
     cleaned_df = handle_duplicate_values_fuzzy(empty_df)
@@ -1,13 +1,9 @@
 import pytest
 import pandas as pd
 import numpy as np
-import sys
-import os
-
-# Add the parent directory to sys.path
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from handle_missing_values import (
+    convert_to_category,
     handle_missing_values_drop,
     handle_missing_values_datatype_imputation,
     handle_missing_values_adjacent_value_imputation,
@@ -16,7 +12,7 @@ from handle_missing_values import (
 )
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def sample_df1():
     return pd.DataFrame({
         "A": [1, 2, None, 4],
@@ -25,16 +21,19 @@ def sample_df1():
     })
 
 
-@pytest.fixture
-def sample_df2():
-    # This will create a DataFrame for testing purposes
-    data = {
-        "A": [1, 2, None, 4],
-        "B": [None, 2, 3, 4],
-        "C": ["a", "a", "c", None]
-    }
-    return pd.DataFrame(data)
+# -------------------------------
+# Test convert_to_category
+# -------------------------------
 
+def test_convert_to_category():
+    df = pd.DataFrame({
+        "few": ["x", "y"] * 15,
+        "many": [str(i % 5) for i in range(30)]
+    })
+    result = convert_to_category(df.copy())
+    # 2 unique values out of 30 rows are less than 10%, but 5 unique values are not
+    assert result["few"].dtype == "category"
+    assert result["many"].dtype == "object"
 
 # -------------------------------
 # Test handle_missing_values_drop
@@ -188,6 +187,17 @@ def test_handle_missing_values_adjacent_value_imputation_interpolation_linear2(s
 # Test handle_missing_values_adjacent_value_imputation (INTERPOLATION_TIME)
 # -------------------------------
 
+@pytest.mark.parametrize("adjacent_imputation_method", [
+    AdjacentImputationMethod.FORWARD,
+    AdjacentImputationMethod.BACKWARD,
+    AdjacentImputationMethod.INTERPOLATION_LINEAR,
+])
+def test_handle_missing_values_adjacent_value_imputation_keeps_original(sample_df2, adjacent_imputation_method):
+    data = sample_df2.copy()
+    handle_missing_values_adjacent_value_imputation(data, adjacent_imputation_method)
+    assert data.equals(sample_df2)
+
+
 def test_handle_missing_values_adjacent_value_imputation_interpolation_time1(sample_df1):
     df = sample_df1.copy()
     df.loc[3, "C"] = pd.to_datetime("2023-01-08")
@@ -197,6 +207,30 @@ def test_handle_missing_values_adjacent_value_imputation_interpolation_time1(sam
     assert result.loc[2, "A"] == pytest.approx(2.33333, rel=1e-5)
 
 
+def test_handle_missing_values_adjacent_value_imputation_interpolation_time_unsorted():
+    df = pd.DataFrame({
+        "value": [None, 4.0, None, 1.0, 2.0],
+        "date": pd.to_datetime(["2023-01-01", "2023-01-05", "2023-01-04", "2023-01-02", "2023-01-03"])
+    })
+    result = handle_missing_values_adjacent_value_imputation(df, AdjacentImputationMethod.INTERPOLATION_TIME, "date")
+    # The missing value before the first valid value is not filled, and the other one is interpolated by the time order
+    assert np.isnan(result.loc[0, "value"])
+    assert result.loc[2, "value"] == pytest.approx(3.0)
+    # The columns keep their order
+    assert list(result.columns) == ["value", "date"]
+
+
+def test_handle_missing_values_adjacent_value_imputation_interpolation_time_missing_time():
+    df = pd.DataFrame({
+        "value": [1.0, None, 3.0, None, 5.0],
+        "date": pd.to_datetime(["2023-01-01", "2023-01-02", None, None, "2023-01-05"])
+    })
+    result = handle_missing_values_adjacent_value_imputation(df, AdjacentImputationMethod.INTERPOLATION_TIME, "date")
+    # The row without a time is not filled, and the row with a time is interpolated only by the rows with a time
+    assert np.isnan(result.loc[3, "value"])
+    assert result.loc[1, "value"] == pytest.approx(2.0)
+
+
 def test_handle_missing_values_adjacent_value_imputation_interpolation_time_invalid_timecolumn():
     df = pd.DataFrame({
         "date": ["a", "b", "c", "d"],
@@ -1,10 +1,6 @@
 import pytest
 import pandas as pd
-import sys
-import os
-
-# Add the parent directory to sys.path
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
 
 from handle_outliers import (
     detect_outliers, 
@@ -14,7 +10,7 @@ from handle_outliers import (
 )
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def sample_df():
     # This will create a DataFrame for testing purposes
     data = {
@@ -29,34 +25,35 @@ def sample_df():
 # -------------------------------
 
 def test_IQR_DROP(sample_df):
-    data = sample_df.copy()
+    # detect_outliers and handle_outliers do not change the given dataset, so there is no need to copy it
+    data = sample_df
     outliers, _ = detect_outliers(data, DetectOutlierMethod.IQR)
     result = handle_outliers(data, HandleOutlierMethod.DROP, outliers)
     assert len(result) < len(data)
     # There are 4 outliers in B and 1 in C
-    assert result["B"].to_list() == [99, 100, 102, 105, 107]
+    np.testing.assert_array_equal(result["B"].to_numpy(), [99, 100, 102, 105, 107])
 
 
 def test_IQR_REPLACE_WITH_MEDIAN(sample_df):
-    data = sample_df.copy()
+    data = sample_df
     outliers, _ = detect_outliers(data, DetectOutlierMethod.IQR)
     result = handle_outliers(data, HandleOutlierMethod.REPLACE_WITH_MEDIAN, outliers)
     # No row will be removed
     assert len(result) == len(sample_df)
     assert result.loc[0, "B"] == sample_df["B"].median()
     assert result.loc[5, "C"] == sample_df["C"].median()
-    assert result["A"].equals(sample_df["A"])
+    pd.testing.assert_series_equal(result["A"], sample_df["A"])
 
 
 def test_IQR_CAP_WITH_BOUNDRIES(sample_df):
-    data = sample_df.copy()
+    data = sample_df
     outliers, boundries = detect_outliers(data, DetectOutlierMethod.IQR)
     result = handle_outliers(data, HandleOutlierMethod.CAP_WITH_BOUNDARIES, outliers, boundries)
     # No row will be removed
     assert len(result) == len(sample_df)
     assert result.loc[0, "B"] == pytest.approx(88.357, rel=1e-3)
     assert result.loc[5, "C"] == 29.0
-    assert result["A"].equals(sample_df["A"].astype("float"))
+    pd.testing.assert_series_equal(result["A"], sample_df["A"].astype("float"))
 
 
 # -------------------------------
@@ -64,31 +61,30 @@ def test_IQR_CAP_WITH_BOUNDRIES(sample_df):
 # -------------------------------
 
 def test_ZSCORE_DROP(sample_df):
-    data = sample_df.copy()
+    data = sample_df
     outliers, _ = detect_outliers(data, DetectOutlierMethod.ZSCORE)
-    print(sample_df["B"].mean(), sample_df["B"].std())
     result = handle_outliers(data, HandleOutlierMethod.DROP, outliers)
     # No outlier is detected by ZSCORE method!
     assert len(result) == len(data)
-    assert result.equals(data)
+    pd.testing.assert_frame_equal(result, data, check_exact=True)
 
 
 def test_ZSCORE_REPLACE_WITH_MEDIAN(sample_df):
-    data = sample_df.copy()
+    data = sample_df
     outliers, _ = detect_outliers(data, DetectOutlierMethod.ZSCORE)
     result = handle_outliers(data, HandleOutlierMethod.REPLACE_WITH_MEDIAN, outliers)
     # No outlier is detected by ZSCORE method!
     assert len(result) == len(data)
-    assert result.equals(data)
+    pd.testing.assert_frame_equal(result, data, check_exact=True)
 
 
 def test_ZSCORE_CAP_WITH_BOUNDRIES(sample_df):
-    data = sample_df.copy()
+    data = sample_df
     outliers, boundries = detect_outliers(data, DetectOutlierMethod.ZSCORE)
     result = handle_outliers(data, HandleOutlierMethod.CAP_WITH_BOUNDARIES, outliers, boundries)
-    # No outlier is detected by ZSCORE method!
+    # No outlier is detected by ZSCORE method! (the columns are only converted to float, since the boundries are float)
     assert len(result) == len(data)
-    assert result.equals(data)
+    pd.testing.assert_frame_equal(result, data.astype("float"), check_exact=True)
 
 
 # -------------------------------
@@ -96,16 +92,16 @@ def test_ZSCORE_CAP_WITH_BOUNDRIES(sample_df):
 # -------------------------------
 
 def test_ISOLATION_FOREST_DROP(sample_df):
-    data = sample_df.copy()
+    data = sample_df
     outliers, _ = detect_outliers(data, DetectOutlierMethod.ISOLATION_FOREST)
     result = handle_outliers(data, HandleOutlierMethod.DROP, outliers)
     assert len(result) < len(data)
     # outliers: {'A': [0, 8, 9], 'B': [0, 1, 8, 9], 'C': [0, 5, 8]}
-    assert result["B"].to_list() == [99, 100, 102, 105, 107]
+    np.testing.assert_array_equal(result["B"].to_numpy(), [99, 100, 102, 105, 107])
 
 
 def test_ISOLATION_FOREST_REPLACE_WITH_MEDIAN(sample_df):
-    data = sample_df.copy()
+    data = sample_df
     outliers, _ = detect_outliers(data, DetectOutlierMethod.ISOLATION_FOREST)
     result = handle_outliers(data, HandleOutlierMethod.REPLACE_WITH_MEDIAN, outliers)
     # No row will be removed
@@ -116,7 +112,7 @@ def test_ISOLATION_FOREST_REPLACE_WITH_MEDIAN(sample_df):
 
 
 def test_ISOLATION_FOREST_CAP_WITH_BOUNDRIES(sample_df):
-    data = sample_df.copy()
+    data = sample_df
     outliers, boundries = detect_outliers(data, DetectOutlierMethod.ISOLATION_FOREST)
     result = handle_outliers(data, HandleOutlierMethod.CAP_WITH_BOUNDARIES, outliers, boundries)
     # No row will be removed
@@ -131,16 +127,16 @@ def test_ISOLATION_FOREST_CAP_WITH_BOUNDRIES(sample_df):
 # -------------------------------
 
 def test_ISOLATION_FOREST_DROP_multivariate(sample_df):
-    data = sample_df.copy()
+    data = sample_df
     outliers, _ = detect_outliers(data, DetectOutlierMethod.ISOLATION_FOREST, per_column_detection=False)
     result = handle_outliers(data, HandleOutlierMethod.DROP, outliers)
     assert len(result) < len(data)
     # outlier_indexes: [0, 5, 8, 9]
-    assert result["B"].to_list() == [12, 99, 100, 102, 105, 107]
+    np.testing.assert_array_equal(result["B"].to_numpy(), [12, 99, 100, 102, 105, 107])
 
 
 def test_ISOLATION_FOREST_REPLACE_WITH_MEDIAN_multivariate(sample_df):
-    data = sample_df.copy()
+    data = sample_df
     outliers, _ = detect_outliers(data, DetectOutlierMethod.ISOLATION_FOREST, per_column_detection=False)
     result = handle_outliers(data, HandleOutlierMethod.REPLACE_WITH_MEDIAN, outliers)
     # No row will be removed
@@ -151,7 +147,7 @@ def test_ISOLATION_FOREST_REPLACE_WITH_MEDIAN_multivariate(sample_df):
 
 
 def test_ISOLATION_FOREST_CAP_WITH_BOUNDRIES_multivariate(sample_df):
-    data = sample_df.copy()
+    data = sample_df
     outliers, boundries = detect_outliers(data, DetectOutlierMethod.ISOLATION_FOREST, per_column_detection=False)
     result = handle_outliers(data, HandleOutlierMethod.CAP_WITH_BOUNDARIES, outliers, boundries)
     # No row will be removed
@@ -166,33 +162,33 @@ def test_ISOLATION_FOREST_CAP_WITH_BOUNDRIES_multivariate(sample_df):
 # -------------------------------
 
 def test_LOCAL_OUTLIER_FACTOR_DROP(sample_df):
-    data = sample_df.copy()
+    data = sample_df
     outliers, _ = detect_outliers(data, DetectOutlierMethod.LOCAL_OUTLIER_FACTOR, n_neighbors=3)
     result = handle_outliers(data, HandleOutlierMethod.DROP, outliers)
     assert len(result) < len(data)
     # outliers: {'A': [], 'B': [0, 1, 8, 9], 'C': [5]}
-    assert result["B"].to_list() == [99, 100, 102, 105, 107]
+    np.testing.assert_array_equal(result["B"].to_numpy(), [99, 100, 102, 105, 107])
 
 
 def test_LOCAL_OUTLIER_FACTOR_REPLACE_WITH_MEDIAN(sample_df):
-    data = sample_df.copy()
+    data = sample_df
     outliers, _ = detect_outliers(data, DetectOutlierMethod.LOCAL_OUTLIER_FACTOR, n_neighbors=3)
     result = handle_outliers(data, HandleOutlierMethod.REPLACE_WITH_MEDIAN, outliers)
     # No row will be removed
     assert len(result) == len(sample_df)
     assert result.loc[0, "B"] == sample_df["B"].median()
     assert result.loc[5, "C"] == sample_df["C"].median()
-    assert result["A"].equals(sample_df["A"])
+    pd.testing.assert_series_equal(result["A"], sample_df["A"])
 
 def test_LOCAL_OUTLIER_FACTOR_CAP_WITH_BOUNDRIES(sample_df):
-    data = sample_df.copy()
+    data = sample_df
     outliers, boundries = detect_outliers(data, DetectOutlierMethod.LOCAL_OUTLIER_FACTOR, n_neighbors=3)
     result = handle_outliers(data, HandleOutlierMethod.CAP_WITH_BOUNDARIES, outliers, boundries)
     # No row will be removed
     assert len(result) == len(sample_df)
     assert result.loc[0, "B"] == 99.0
     assert result.loc[5, "C"] == 20.0
-    assert result["A"].equals(sample_df["A"])
+    pd.testing.assert_series_equal(result["A"], sample_df["A"])
 
 
 # -------------------------------
@@ -200,16 +196,16 @@ def test_LOCAL_OUTLIER_FACTOR_CAP_WITH_BOUNDRIES(sample_df):
 # -------------------------------
 
 def test_LOCAL_OUTLIER_FACTOR_DROP_multivariate(sample_df):
-    data = sample_df.copy()
+    data = sample_df
     outliers, _ = detect_outliers(data, DetectOutlierMethod.LOCAL_OUTLIER_FACTOR, n_neighbors=3, per_column_detection=False)
     result = handle_outliers(data, HandleOutlierMethod.DROP, outliers)
     assert len(result) < len(data)
     # outlier_indexes: [0, 1, 5, 8, 9]
-    assert result["B"].to_list() == [99, 100, 102, 105, 107]
+    np.testing.assert_array_equal(result["B"].to_numpy(), [99, 100, 102, 105, 107])
 
 
 def test_LOCAL_OUTLIER_FACTOR_REPLACE_WITH_MEDIAN_multivariate(sample_df):
-    data = sample_df.copy()
+    data = sample_df
     outliers, _ = detect_outliers(data, DetectOutlierMethod.LOCAL_OUTLIER_FACTOR, n_neighbors=3, per_column_detection=False)
     result = handle_outliers(data, HandleOutlierMethod.REPLACE_WITH_MEDIAN, outliers)
     # No row will be removed
@@ -218,10 +214,22 @@ def test_LOCAL_OUTLIER_FACTOR_REPLACE_WITH_MEDIAN_multivariate(sample_df):
     assert result.loc[5, "C"] == sample_df["C"].median()
 
 def test_LOCAL_OUTLIER_FACTOR_CAP_WITH_BOUNDRIES_multivariate(sample_df):
-    data = sample_df.copy()
+    data = sample_df
     outliers, boundries = detect_outliers(data, DetectOutlierMethod.LOCAL_OUTLIER_FACTOR, n_neighbors=3, per_column_detection=False)
     result = handle_outliers(data, HandleOutlierMethod.CAP_WITH_BOUNDARIES, outliers, boundries)
     # No row will be removed
     assert len(result) == len(sample_df)
     assert result.loc[0, "B"] == 99.0
     assert result.loc[5, "C"] == 18.0
+
+
+# -------------------------------
+# Test handle methods do not change the given dataset
+# -------------------------------
+
+@pytest.mark.parametrize("handle_outlier_method", list(HandleOutlierMethod))
+def test_handle_outliers_keeps_original(sample_df, handle_outlier_method):
+    data = sample_df.copy()
+    outliers, boundries = detect_outliers(data, DetectOutlierMethod.IQR)
+    handle_outliers(data, handle_outlier_method, outliers, boundries)
+    assert data.equals(sample_df)